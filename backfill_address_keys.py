@@ -0,0 +1,101 @@
+"""
+Заполняет houses.address_key и триграммы улиц (house_trigrams) у существующих домов.
+
+    python backfill_address_keys.py            # заполнить и выключить дубли
+    python backfill_address_keys.py --dry-run  # только показать, что изменится
+
+Обязательный шаг выката: поиск домов идёт только по address_key и триграммам,
+поэтому до запуска скрипта существующие дома боту не видны (bot.py предупреждает
+об этом при старте). Порядок: добавить колонку address_key (nullable), запустить
+скрипт, затем перевести uk_house на (area_id, address_key).
+
+Дома, чей адрес после нормализации совпал с более старым домом того же участка,
+помечаются is_active = False и остаются без ключа. Их подъезды вместе с квартирами,
+оборудованием и фото переносятся на старый дом; подъезды с уже занятым номером
+остаются у дубля и выводятся в отчёте — их нужно сверить вручную.
+Триграммы пересобираются у всех остальных домов, скрипт можно запускать повторно.
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+from sqlalchemy import select, update
+
+from db.db import async_session
+from db.models import House
+from db.crud.houses import merge_duplicate_house, save_house_trigrams
+from utils.address_norm import address_key
+
+
+logger = logging.getLogger("backfill_address_keys")
+
+
+async def backfill(dry_run: bool, batch: int = 500) -> Tuple[int, int, int]:
+    filled = duplicates = unmerged = 0
+    seen: Dict[Tuple[str, str], int] = {}
+    last_id = 0
+    async with async_session() as session:
+        while True:
+            rows = (await session.execute(
+                select(House.id, House.area_id, House.street, House.house_number, House.address_key)
+                .where(House.id > last_id)
+                .order_by(House.id)
+                .limit(batch)
+            )).all()
+            if not rows:
+                break
+
+            for house_id, area_id, street, house_number, current_key in rows:
+                last_id = house_id
+                key = address_key(street, house_number)
+                original = seen.setdefault((area_id, key), house_id)
+                # updated_at не трогаем: он означает свежесть данных 2ГИС
+                if original != house_id:
+                    duplicates += 1
+                    moved, conflicts = await merge_duplicate_house(session, house_id, original)
+                    print(
+                        f"Дубль: дом {house_id} «{street} {house_number}» = дом {original} ({key}), "
+                        f"перенесено подъездов: {moved}"
+                    )
+                    if conflicts:
+                        unmerged += len(conflicts)
+                        print(
+                            f"  ⚠️ Подъезды {', '.join(map(str, conflicts))} дома {house_id} не перенесены: "
+                            f"у дома {original} такие номера уже есть, сверьте вручную"
+                        )
+                    values = {"address_key": None, "is_active": False}
+                else:
+                    await save_house_trigrams(session, house_id, street)
+                    if current_key == key:
+                        continue
+                    filled += 1
+                    values = {"address_key": key}
+                await session.execute(
+                    update(House).where(House.id == house_id).values(updated_at=House.updated_at, **values)
+                )
+
+            if dry_run:
+                await session.rollback()
+            else:
+                await session.commit()
+            # Записанные триграммы больше не нужны в identity map
+            session.expunge_all()
+    return filled, duplicates, unmerged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    filled, duplicates, unmerged = asyncio.run(backfill(args.dry_run))
+    suffix = " (без записи в БД)" if args.dry_run else ""
+    print(
+        f"Ключей заполнено: {filled}, дублей выключено: {duplicates}, "
+        f"подъездов не перенесено: {unmerged}{suffix}"
+    )
+
+
+if __name__ == "__main__":
+    main()
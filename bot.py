@@ -8,6 +8,14 @@ from config import *
 
 
 from handlers import register_all_routers
+from middlewares.db import DbSessionMiddleware
+from db.db import async_session
+from db.crud.houses import count_houses_without_address_key
+from utils.parser_pool import parser_pool
+from utils.parser_workers import parser_workers
+from utils.scrape_jobs import scrape_jobs
+from utils.zone_crawler import zone_crawler
+from utils.house_refresher import house_refresher
 
 
 bot = Bot(
@@ -17,11 +25,35 @@ bot = Bot(
 
 
 dp = Dispatcher()
+# Сессия БД и строка пользователя открываются один раз на апдейт
+dp.update.middleware(DbSessionMiddleware(async_session))
 register_all_routers(dp)
 
 
+async def check_address_keys():
+    async with async_session() as session:
+        missing = await count_houses_without_address_key(session)
+    if missing:
+        logger.warning(
+            "У %s активных домов нет address_key — поиск по адресу их не находит. "
+            "Запустите python backfill_address_keys.py", missing
+        )
+
+
 async def main():
     logger.info("Запускаем TechLineBot...")
+    # Браузер живёт либо в процессе бота, либо в отдельных воркерах
+    browser = parser_workers if parser_workers.enabled else parser_pool
+    dp.startup.register(check_address_keys)
+    dp.startup.register(browser.start)
+    dp.startup.register(scrape_jobs.start)
+    dp.startup.register(zone_crawler.start)
+    dp.startup.register(house_refresher.start)
+    # Сначала дожидаемся фоновых задач, потом закрываем браузер
+    dp.shutdown.register(house_refresher.stop)
+    dp.shutdown.register(zone_crawler.stop)
+    dp.shutdown.register(scrape_jobs.stop)
+    dp.shutdown.register(browser.stop)
     await dp.start_polling(bot)
 
 
@@ -14,6 +14,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def env_list(name: str, default: str) -> list[str]:
+    return [item.strip() for item in os.getenv(name, default).split(',') if item.strip()]
+
+
 load_dotenv()
 
 
@@ -22,6 +26,8 @@ DB_PORT = os.getenv('DB_PORT', '3306')
 DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_NAME = os.getenv('DB_NAME')
+# Соединение, простаивающее между запросами дольше этого, попадает в лог
+DB_IDLE_WARN_SECONDS = float(os.getenv('DB_IDLE_WARN_SECONDS', '1'))
 
 DATABASE_URL_ASYNC = (
     f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
@@ -32,4 +38,83 @@ DATABASE_URL_SYNC = (
 )
 
 
-BOT_TOKEN = os.getenv('TOKEN')
\ No newline at end of file
+BOT_TOKEN = os.getenv('TOKEN')
+
+# Пул браузерных страниц для парсера 2ГИС
+PARSER_HEADLESS = os.getenv('PARSER_HEADLESS', '0') == '1'
+PARSER_POOL_SIZE = int(os.getenv('PARSER_POOL_SIZE', '2'))
+PARSER_PAGE_MAX_NAVIGATIONS = int(os.getenv('PARSER_PAGE_MAX_NAVIGATIONS', '50'))
+PARSER_PAGE_MAX_HEAP_MB = int(os.getenv('PARSER_PAGE_MAX_HEAP_MB', '300'))
+PARSER_CONTEXT_MAX_LEASES = int(os.getenv('PARSER_CONTEXT_MAX_LEASES', '100'))
+
+# Сторож памяти: при превышении RSS браузера (или суммы JS-heap без psutil) браузер перезапускается
+PARSER_BROWSER_MAX_RSS_MB = int(os.getenv('PARSER_BROWSER_MAX_RSS_MB', '1500'))
+PARSER_WATCHDOG_INTERVAL = int(os.getenv('PARSER_WATCHDOG_INTERVAL', '60'))
+
+# Сессия 2ГИС: файл storage_state из auth_storage.py и cookie, по которым судим о входе.
+# Без PARSER_SESSION_COOKIES срок сессии не проверяется, а auth_storage.py не запускается
+PARSER_STORAGE_STATE = os.getenv('PARSER_STORAGE_STATE', './storage_state.json')
+PARSER_SESSION_COOKIES = env_list('PARSER_SESSION_COOKIES', '')
+PARSER_SESSION_WARN_DAYS = int(os.getenv('PARSER_SESSION_WARN_DAYS', '3'))
+
+# Отдельные процессы для парсера 2ГИС (0 — браузер в процессе бота)
+PARSER_WORKERS = int(os.getenv('PARSER_WORKERS', '0'))
+PARSER_WORKER_PING_INTERVAL = int(os.getenv('PARSER_WORKER_PING_INTERVAL', '60'))
+PARSER_WORKER_PING_TIMEOUT = int(os.getenv('PARSER_WORKER_PING_TIMEOUT', '30'))
+
+# Очередь парсинга 2ГИС
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', str(PARSER_WORKERS or PARSER_POOL_SIZE)))
+SCRAPE_QUEUE_MAX_DEPTH = int(os.getenv('SCRAPE_QUEUE_MAX_DEPTH', '20'))
+SCRAPE_QUEUE_MAX_PER_USER = int(os.getenv('SCRAPE_QUEUE_MAX_PER_USER', '2'))
+
+# Фильтр запросов браузера: что не нужно для чтения карточек
+PARSER_BLOCK_RESOURCE_TYPES = env_list('PARSER_BLOCK_RESOURCE_TYPES', 'image,font,media')
+PARSER_BLOCK_URL_PATTERNS = env_list(
+    'PARSER_BLOCK_URL_PATTERNS',
+    'maps.2gis.com/tiles,/tiles/,google-analytics,googletagmanager,mc.yandex,top-fwz1.mail.ru,'
+    'vk.com/rtrg,stat.2gis,sentry,favorites.api.2gis'
+)
+PARSER_ALLOW_URL_PATTERNS = env_list('PARSER_ALLOW_URL_PATTERNS', 'catalog.api.2gis')
+
+# Откуда брать данные карточки: api — JSON каталога 2ГИС (с откатом на вёрстку), dom — только вёрстка
+PARSER_EXTRACTION_MODE = os.getenv('PARSER_EXTRACTION_MODE', 'api')
+
+# Архив сырых карточек 2ГИС для повторного извлечения без сети (reextract.py)
+PARSER_SNAPSHOTS = os.getenv('PARSER_SNAPSHOTS', '0') == '1'
+PARSER_SNAPSHOT_DIR = os.getenv('PARSER_SNAPSHOT_DIR', 'snapshots')
+
+# Сколько карточек-кандидатов ЖЭУ открывать параллельно — на все поиски процесса вместе
+PARSER_CANDIDATE_TABS = int(os.getenv('PARSER_CANDIDATE_TABS', '3'))
+
+# Ограничение частоты переходов к 2ГИС, повторы и предохранитель
+PARSER_RATE_PER_SEC = float(os.getenv('PARSER_RATE_PER_SEC', '1'))
+PARSER_RATE_BURST = int(os.getenv('PARSER_RATE_BURST', '3'))
+PARSER_RETRY_ATTEMPTS = int(os.getenv('PARSER_RETRY_ATTEMPTS', '3'))
+PARSER_RETRY_BASE_DELAY = float(os.getenv('PARSER_RETRY_BASE_DELAY', '1'))
+# Сколько секунд один переход к 2ГИС может занять вместе с повторами
+PARSER_GOTO_BUDGET = float(os.getenv('PARSER_GOTO_BUDGET', '45'))
+PARSER_BREAKER_THRESHOLD = int(os.getenv('PARSER_BREAKER_THRESHOLD', '5'))
+PARSER_BREAKER_COOLDOWN = int(os.getenv('PARSER_BREAKER_COOLDOWN', '300'))
+
+# Фоновый обход домов района при его добавлении
+CRAWL_ON_ZONE_CREATE = os.getenv('CRAWL_ON_ZONE_CREATE', '1') == '1'
+CRAWL_QUERY_TEMPLATE = os.getenv('CRAWL_QUERY_TEMPLATE', 'жилой дом {zone}')
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '50'))
+CRAWL_HOUSE_DELAY = float(os.getenv('CRAWL_HOUSE_DELAY', '3'))
+
+# Обновление устаревших домов в непиковые часы (часы по Москве)
+REFRESH_MAX_AGE_DAYS = int(os.getenv('REFRESH_MAX_AGE_DAYS', '90'))
+REFRESH_WINDOW_START = int(os.getenv('REFRESH_WINDOW_START', '1'))
+REFRESH_WINDOW_END = int(os.getenv('REFRESH_WINDOW_END', '6'))
+REFRESH_BATCH = int(os.getenv('REFRESH_BATCH', '20'))
+REFRESH_INTERVAL = int(os.getenv('REFRESH_INTERVAL', '600'))
+REFRESH_HOUSE_DELAY = float(os.getenv('REFRESH_HOUSE_DELAY', '5'))
+
+# Кэш результатов парсинга 2ГИС
+SCRAPE_CACHE_TTL_HOURS = int(os.getenv('SCRAPE_CACHE_TTL_HOURS', '168'))
+SCRAPE_CACHE_NEGATIVE_TTL_HOURS = int(os.getenv('SCRAPE_CACHE_NEGATIVE_TTL_HOURS', '6'))
+SCRAPE_CACHE_LRU_SIZE = int(os.getenv('SCRAPE_CACHE_LRU_SIZE', '512'))
+SCRAPE_CACHE_MAX_ROWS = int(os.getenv('SCRAPE_CACHE_MAX_ROWS', '20000'))
+
+# Таймаут фоновой задачи парсинга (с ожиданием в очереди), секунды
+SCRAPE_JOB_TIMEOUT = int(os.getenv('SCRAPE_JOB_TIMEOUT', '120'))
@@ -0,0 +1,55 @@
+from typing import Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from db.models import CrawlJob, Zone
+
+
+async def create_crawl_job(
+    session: AsyncSession,
+    *,
+    zone_id: int,
+    query: str,
+    created_by: int,
+    status_chat_id: Optional[int] = None,
+    status_message_id: Optional[int] = None
+) -> CrawlJob:
+    job = CrawlJob(
+        zone_id=zone_id,
+        query=query,
+        created_by=created_by,
+        status_chat_id=status_chat_id,
+        status_message_id=status_message_id,
+    )
+    session.add(job)
+    await session.commit()
+    return job
+
+
+async def get_crawl_job(session: AsyncSession, job_id: int) -> Optional[CrawlJob]:
+    result = await session.execute(
+        select(CrawlJob)
+        .where(CrawlJob.id == job_id)
+        .options(selectinload(CrawlJob.zone).selectinload(Zone.city))
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_unfinished_crawl_jobs(session: AsyncSession) -> Sequence[CrawlJob]:
+    result = await session.execute(
+        select(CrawlJob)
+        .where(CrawlJob.status.in_(("pending", "running")))
+        .order_by(CrawlJob.id)
+    )
+    return result.scalars().all()
+
+
+async def update_crawl_job(session: AsyncSession, job_id: int, **fields) -> None:
+    job = await session.get(CrawlJob, job_id)
+    if job is None:
+        return
+    for name, value in fields.items():
+        setattr(job, name, value)
+    await session.commit()
@@ -1,9 +1,18 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 from collections.abc import Sequence
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import case, delete, desc, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import ScalarResult
-from db.models import House, HouseEntrance
+from sqlalchemy.orm import joinedload, selectinload
+from db.models import House, HouseEntrance, HouseTrigram, Zone, msk_now
+from utils.address_norm import address_key, normalize_house_number, street_trigrams
+
+# Всё, что нужно для карточки дома без дополнительных запросов
+HOUSE_DETAILS = (
+    joinedload(House.zone).joinedload(Zone.city),
+    selectinload(House.entrances_rel).selectinload(HouseEntrance.flats_ranges),
+)
 
 
 async def get_house_by_id(session: AsyncSession, house_id: int) -> Optional[House]:
@@ -35,14 +44,151 @@ async def get_house_by_address(
         select(House).where(
             House.area_id == area_id,
             House.zone_id == zone_id,
-            House.street == street,
-            House.house_number == house_number,
+            House.address_key == address_key(street, house_number),
+            House.is_active == True
+        )
+    )
+    return result.scalars().first()
+
+
+async def get_house_by_address_in_zones(
+    session: AsyncSession,
+    area_id: str,
+    zone_ids: Sequence[int],
+    street: str,
+    house_number: str
+) -> Optional[House]:
+    """
+    Дом по адресу в любом из районов одним запросом по индексу uk_house
+    (area_id, address_key). Район, город, подъезды и диапазоны квартир
+    подгружаются сразу — карточка дома строится без дополнительных запросов.
+    """
+    if not zone_ids:
+        return None
+    result = await session.execute(
+        select(House)
+        .where(
+            House.area_id == area_id,
+            House.address_key == address_key(street, house_number),
+            House.zone_id.in_(zone_ids),
             House.is_active == True
         )
+        .options(*HOUSE_DETAILS)
+        .limit(1)
     )
     return result.scalars().first()
 
 
+async def get_house_with_details(session: AsyncSession, house_id: int) -> Optional[House]:
+    result = await session.execute(
+        select(House).where(House.id == house_id).options(*HOUSE_DETAILS)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_house_trigrams(session: AsyncSession, house_id: int, street: str) -> None:
+    """Пересобирает триграммы улицы дома; commit — на вызывающем."""
+    await session.execute(delete(HouseTrigram).where(HouseTrigram.house_id == house_id))
+    session.add_all(HouseTrigram(house_id=house_id, trigram=t) for t in street_trigrams(street))
+
+
+async def count_houses_without_address_key(session: AsyncSession) -> int:
+    """Активные дома без address_key: поиск по адресу их не видит до backfill_address_keys.py."""
+    result = await session.execute(
+        select(func.count()).select_from(House).where(House.address_key.is_(None), House.is_active == True)
+    )
+    return result.scalar_one()
+
+
+async def merge_duplicate_house(session: AsyncSession, duplicate_id: int, house_id: int) -> Tuple[int, List[int]]:
+    """
+    Переносит подъезды дубля (с квартирами, оборудованием и фото) на дом house_id.
+    Подъезды, чей номер у house_id уже есть, остаются у дубля. Возвращает число
+    перенесённых и номера оставленных подъездов; commit — на вызывающем.
+    """
+    taken = set((await session.execute(
+        select(HouseEntrance.entrance_number).where(HouseEntrance.house_id == house_id)
+    )).scalars())
+    entrances = (await session.execute(
+        select(HouseEntrance.id, HouseEntrance.entrance_number).where(HouseEntrance.house_id == duplicate_id)
+    )).all()
+    movable = [entrance_id for entrance_id, number in entrances if number not in taken]
+    conflicts = sorted(number for _, number in entrances if number in taken)
+    if movable:
+        await session.execute(
+            update(HouseEntrance)
+            .where(HouseEntrance.id.in_(movable))
+            .values(house_id=house_id, updated_at=HouseEntrance.updated_at)
+        )
+
+    # ЖЭУ и число подъездов дубля дополняют оставшийся дом, но не перетирают его данные
+    duplicate = (await session.execute(
+        select(House.housing_office_id, House.entrances).where(House.id == duplicate_id)
+    )).one()
+    values = {"entrances": func.greatest(House.entrances, duplicate.entrances)}
+    if duplicate.housing_office_id is not None:
+        values["housing_office_id"] = func.coalesce(House.housing_office_id, duplicate.housing_office_id)
+    await session.execute(
+        update(House).where(House.id == house_id).values(updated_at=House.updated_at, **values)
+    )
+    return len(movable), conflicts
+
+
+async def find_house_candidates(
+    session: AsyncSession,
+    area_id: str,
+    zone_ids: Sequence[int],
+    street: str,
+    house_number: str,
+    limit: int = 5,
+    min_score: float = 0.5
+) -> List[House]:
+    """
+    Дома, чья улица похожа на street (опечатка, часть названия), по таблице
+    house_trigrams. Сначала дома с тем же номером, затем по доле совпавших
+    триграмм запроса; ниже min_score кандидаты отбрасываются.
+    """
+    query_trigrams = street_trigrams(street)
+    if not query_trigrams or not zone_ids:
+        return []
+
+    number = normalize_house_number(house_number)
+    hits = func.count().label("hits")
+    # Совпадение номера учитываем до LIMIT: на длинной улице нужный дом иначе не попал бы в выборку
+    number_escaped = number.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    same_number = func.max(
+        case((House.address_key.like(f"%|{number_escaped}", escape="\\"), 1), else_=0)
+    ).label("same_number")
+    rows = (await session.execute(
+        select(HouseTrigram.house_id, hits, same_number)
+        .join(House, House.id == HouseTrigram.house_id)
+        .where(
+            HouseTrigram.trigram.in_(query_trigrams),
+            House.area_id == area_id,
+            House.zone_id.in_(zone_ids),
+            House.is_active == True
+        )
+        .group_by(HouseTrigram.house_id)
+        .having(hits >= min_score * len(query_trigrams))
+        .order_by(desc(same_number), desc(hits))
+        .limit(limit * 4)
+    )).all()
+    scores = {house_id: count / len(query_trigrams) for house_id, count, _ in rows}
+    if not scores:
+        return []
+
+    houses = (await session.execute(
+        select(House).where(House.id.in_(scores)).options(joinedload(House.zone))
+    )).scalars().all()
+
+    def rank(house: House):
+        # Похожесть в обе стороны, чтобы короткая улица не уступала длинной с тем же вхождением
+        jaccard = scores[house.id] * len(query_trigrams) / len(query_trigrams | street_trigrams(house.street))
+        return normalize_house_number(house.house_number) == number, scores[house.id], jaccard
+
+    return sorted(houses, key=rank, reverse=True)[:limit]
+
+
 async def create_house_with_entrances(
     session: AsyncSession,
     *,
@@ -60,6 +206,7 @@ async def create_house_with_entrances(
         zone_id=zone_id,
         street=street,
         house_number=house_number,
+        address_key=address_key(street, house_number),
         floors=floors,
         entrances=entrances,
         is_in_gks=False,
@@ -83,6 +230,7 @@ async def create_house_with_entrances(
         )
         session.add(entrance)
 
+    await save_house_trigrams(session, house.id, street)
     await session.commit()
     await session.refresh(house)
     return house
@@ -99,4 +247,39 @@ async def get_entrances_by_house(
     return result.all()
 
 
+async def touch_house_lookup(session: AsyncSession, house_id: int) -> None:
+    # updated_at не трогаем: он означает свежесть данных, а не обращения
+    await session.execute(
+        update(House)
+        .where(House.id == house_id)
+        .values(
+            lookup_count=House.lookup_count + 1,
+            last_lookup_at=msk_now(),
+            updated_at=House.updated_at
+        )
+    )
+    await session.commit()
+
+
+async def get_stale_houses(
+    session: AsyncSession,
+    older_than: datetime,
+    limit: int,
+    exclude_ids: Sequence[int] = ()
+) -> Sequence[House]:
+    """Дома с данными старше older_than, самые востребованные первыми."""
+    stmt = select(House).where(House.is_active == True, House.updated_at < older_than)
+    if exclude_ids:
+        stmt = stmt.where(House.id.notin_(exclude_ids))
+    result = await session.execute(
+        stmt
+        .order_by(House.lookup_count.desc(), House.updated_at)
+        .limit(limit)
+        .options(selectinload(House.zone).selectinload(Zone.city))
+    )
+    return result.scalars().all()
+
 
+async def get_houses_by_snapshot(session: AsyncSession, snapshot_sha: str) -> Sequence[House]:
+    result = await session.execute(select(House).where(House.snapshot_sha == snapshot_sha))
+    return result.scalars().all()
@@ -14,6 +14,7 @@ async def create_housing_office(
     working_hours: str = "",
     phone: str = "",
     email: str = "",
+    snapshot_sha: Optional[str] = None,
 ) -> HousingOffice:
     office = HousingOffice(
         name=name,
@@ -25,6 +26,7 @@ async def create_housing_office(
         working_hours=working_hours,
         phone=phone,
         email=email,
+        snapshot_sha=snapshot_sha,
     )
     session.add(office)
     await session.commit()
@@ -54,4 +56,8 @@ async def update_housing_office(
 
 async def delete_housing_office(session: AsyncSession, office_id: int) -> None:
     await session.execute(delete(HousingOffice).where(HousingOffice.id == office_id))
-    await session.commit()
\ No newline at end of file
+    await session.commit()
+
+async def get_housing_offices_by_snapshot(session: AsyncSession, snapshot_sha: str) -> Sequence[HousingOffice]:
+    result = await session.execute(select(HousingOffice).where(HousingOffice.snapshot_sha == snapshot_sha))
+    return result.scalars().all()
@@ -2,9 +2,11 @@ import re
 from typing import Optional, Dict, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from db.models import House, HouseEntrance, EntranceFlatsRange, Zone, City
+from db.models import House, HouseEntrance, EntranceFlatsRange, Zone, City, msk_now
 from datetime import datetime
 from sqlalchemy.orm import selectinload
+from utils.address_norm import address_key, split_street_and_number
+from db.crud.houses import save_house_trigrams
 
 
 def extract_house_meta(parsed_data: dict) -> Tuple[str, str, int, int, Dict[int, List[Tuple[int, int]]]]:
@@ -13,10 +15,8 @@ def extract_house_meta(parsed_data: dict) -> Tuple[str, str, int, int, Dict[int,
     entrances_text = parsed_data.get("entrances", "")
     apartments_raw = parsed_data.get("apartments", [])
 
-    # Улица и номер
-    street_match = re.match(r"^(.*?)\s+(\S+)$", title)
-    street = street_match.group(1).strip() if street_match else title
-    house_number = street_match.group(2).strip() if street_match else ""
+    # Улица и номер («Тимирязева 4 к2» -> «Тимирязева», «4 к2»)
+    street, house_number = split_street_and_number(title)
 
     # Этажи
     floors_match = re.search(r"(\d+)", floors_text)
@@ -50,11 +50,11 @@ async def save_parsed_house_to_db(
 ) -> int:
     street, house_number, floors, entrances_count, entrances_info = extract_house_meta(parsed_data)
 
-    # Проверка на существующий дом
+    # Проверка на существующий дом: «ул. Тимирязева, 4» и «Тимирязева 4» — один дом
+    key = address_key(street, house_number)
     stmt = select(House).where(
         House.area_id == area_id,
-        House.street == street,
-        House.house_number == house_number
+        House.address_key == key
     )
     existing = (await session.execute(stmt)).scalar_one_or_none()
     if existing:
@@ -66,9 +66,11 @@ async def save_parsed_house_to_db(
         zone_id=zone_id,
         street=street,
         house_number=house_number,
+        address_key=key,
         entrances=entrances_count,
         floors=floors,
         notes=notes or "",
+        snapshot_sha=parsed_data.get("snapshot_sha"),
         created_by=created_by,
         updated_by=created_by,
     )
@@ -103,10 +105,88 @@ async def save_parsed_house_to_db(
                 end_flat=end
             ))
 
+    await save_house_trigrams(session, house.id, street)
     await session.commit()
     return house.id
 
 
+async def apply_parsed_house_diff(
+    session: AsyncSession,
+    house_id: int,
+    parsed_data: dict,
+    updated_by: int
+) -> bool:
+    """
+    Сверяет свежие данные 2ГИС с домом и пишет только изменившиеся строки.
+    Пустые поля из 2ГИС не затирают сохранённые данные. updated_at дома
+    обновляется всегда — данные проверены. Возвращает True, если что-то изменилось.
+    """
+    stmt = (
+        select(House)
+        .where(House.id == house_id)
+        .options(selectinload(House.entrances_rel).selectinload(HouseEntrance.flats_ranges))
+    )
+    house = (await session.execute(stmt)).scalar_one_or_none()
+    if house is None:
+        return False
+
+    _, _, floors, entrances_count, entrances_info = extract_house_meta(parsed_data)
+    changed = False
+
+    if floors and house.floors != floors:
+        house.floors = floors
+        changed = True
+    if entrances_count and house.entrances != entrances_count:
+        house.entrances = entrances_count
+        changed = True
+
+    existing = {e.entrance_number: e for e in house.entrances_rel}
+    for entrance_number in range(1, house.entrances + 1):
+        flats_ranges = entrances_info.get(entrance_number, [])
+        entrance = existing.get(entrance_number)
+
+        if entrance is None:
+            entrance = HouseEntrance(
+                house_id=house.id,
+                entrance_number=entrance_number,
+                floors=house.floors,
+                flats_text="",
+                notes="",
+                created_by=updated_by,
+                updated_by=updated_by,
+            )
+            session.add(entrance)
+            await session.flush()
+            await session.refresh(entrance, ["flats_ranges"])
+            changed = True
+        elif floors and entrance.floors != floors:
+            entrance.floors = floors
+            entrance.updated_by = updated_by
+            changed = True
+
+        if not flats_ranges:
+            continue
+        stored = sorted((r.start_flat, r.end_flat) for r in entrance.flats_ranges)
+        if stored == sorted(flats_ranges):
+            continue
+
+        for old in list(entrance.flats_ranges):
+            await session.delete(old)
+        for start, end in flats_ranges:
+            session.add(EntranceFlatsRange(entrance_id=entrance.id, start_flat=start, end_flat=end))
+        entrance.flats_text = ", ".join(f"{s}–{e}" for s, e in flats_ranges)
+        entrance.updated_by = updated_by
+        changed = True
+
+    if changed:
+        house.updated_by = updated_by
+    if parsed_data.get("snapshot_sha"):
+        house.snapshot_sha = parsed_data["snapshot_sha"]
+    house.updated_at = msk_now()
+    await session.commit()
+    return changed
+
+
 
 async def get_house_parsed_view(session: AsyncSession, house_id: int) -> Optional[Dict]:
     stmt = (
@@ -121,7 +201,11 @@ async def get_house_parsed_view(session: AsyncSession, house_id: int) -> Optiona
     house = result.scalar_one_or_none()
     if house is None:
         return None
+    return build_house_parsed_view(house)
+
 
+def build_house_parsed_view(house: House) -> Dict:
+    """Карточка дома для build_parsed_house_info; zone.city, entrances_rel и flats_ranges должны быть загружены."""
     title = f"{house.street} {house.house_number}"
     floors_text = f"{house.floors} этажей" if house.floors else "Не указано"
     entrances_text = f"{house.entrances} подъездов" if house.entrances else "Не указано"
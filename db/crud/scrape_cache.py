@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import ScrapeCache
+
+
+async def get_scrape_cache_entry(
+    session: AsyncSession,
+    key_hash: str,
+    now: datetime
+) -> Optional[ScrapeCache]:
+    result = await session.execute(
+        select(ScrapeCache).where(
+            ScrapeCache.key_hash == key_hash,
+            ScrapeCache.expires_at > now
+        )
+    )
+    return result.scalar_one_or_none()
+
+
+async def upsert_scrape_cache_entry(
+    session: AsyncSession,
+    *,
+    key_hash: str,
+    kind: str,
+    city_url: str,
+    query: str,
+    payload: Optional[str],
+    expires_at: datetime
+) -> ScrapeCache:
+    result = await session.execute(
+        select(ScrapeCache).where(ScrapeCache.key_hash == key_hash)
+    )
+    entry = result.scalar_one_or_none()
+    if entry is None:
+        entry = ScrapeCache(key_hash=key_hash, kind=kind, city_url=city_url, query=query)
+        session.add(entry)
+
+    entry.payload = payload
+    entry.expires_at = expires_at
+    await session.commit()
+    return entry
+
+
+async def evict_scrape_cache(session: AsyncSession, now: datetime, max_rows: int) -> None:
+    """Удаляет просроченные записи и самые старые сверх max_rows."""
+    await session.execute(delete(ScrapeCache).where(ScrapeCache.expires_at <= now))
+
+    cutoff = (
+        await session.execute(
+            select(ScrapeCache.expires_at)
+            .order_by(ScrapeCache.expires_at.desc())
+            .offset(max_rows)
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+    if cutoff is not None:
+        await session.execute(delete(ScrapeCache).where(ScrapeCache.expires_at <= cutoff))
+
+    await session.commit()
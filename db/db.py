@@ -1,11 +1,17 @@
+import logging
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
+from config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DB_IDLE_WARN_SECONDS
 from db.base import Base
 from typing import AsyncGenerator
 
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL_ASYNC = (
     f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
@@ -22,6 +28,53 @@ async_session = sessionmaker(
 )
 
 
+# Сторож удержания соединений: сессия, которая держит соединение пула, пока
+# ждёт Telegram или 2ГИС, отнимает его у других обработчиков. Между выдачей
+# соединения из пула и возвратом замеряем самую длинную паузу без запросов.
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    now = time.monotonic()
+    connection_record.info["checked_out_at"] = now
+    connection_record.info["last_activity"] = now
+    connection_record.info["max_idle"] = 0.0
+    connection_record.info["first_statement"] = None
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _on_before_execute(conn, cursor, statement, parameters, context, executemany):
+    info = conn.info
+    if "last_activity" not in info:
+        return
+    info["max_idle"] = max(info["max_idle"], time.monotonic() - info["last_activity"])
+    if info["first_statement"] is None:
+        info["first_statement"] = " ".join(statement.split())[:100]
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _on_after_execute(conn, cursor, statement, parameters, context, executemany):
+    info = conn.info
+    if "last_activity" in info:
+        info["last_activity"] = time.monotonic()
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    info = connection_record.info
+    checked_out_at = info.pop("checked_out_at", None)
+    if checked_out_at is None:
+        return
+    now = time.monotonic()
+    # Пауза после последнего запроса до возврата — тоже простой (обычно await до commit)
+    max_idle = max(info.pop("max_idle"), now - info.pop("last_activity"))
+    first_statement = info.pop("first_statement")
+    if max_idle >= DB_IDLE_WARN_SECONDS:
+        logger.warning(
+            "Соединение БД удерживалось %.2f с, из них %.2f с без запросов (первый запрос: %s)",
+            now - checked_out_at, max_idle, first_statement or "—"
+        )
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
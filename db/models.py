@@ -125,6 +125,9 @@ class House(Base):
 
     street: Mapped[str] = mapped_column(String(255), nullable=False)
     house_number: Mapped[str] = mapped_column(String(50), nullable=False)
+    # Нормализованный адрес (utils/address_norm.address_key): по нему ищем дом и
+    # не даём завести дубль. NULL только у старых строк до backfill_address_keys.py
+    address_key: Mapped[str | None] = mapped_column(String(320), nullable=True)
     entrances: Mapped[int] = mapped_column(SmallInteger, nullable=False)
     floors: Mapped[int] = mapped_column(SmallInteger, nullable=False)
 
@@ -135,7 +138,7 @@ class House(Base):
 
     created_at: Mapped[datetime] = mapped_column(DateTime, default=msk_now)
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=msk_now, onupdate=msk_now
+        DateTime, default=msk_now, onupdate=msk_now, index=True
     )
     created_by: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("users.id"), nullable=False
@@ -143,9 +146,14 @@ class House(Base):
     updated_by: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("users.id"), nullable=False
     )
+    # Популярность дома: в каком порядке обновлять устаревшие данные
+    lookup_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_lookup_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # sha снимка карточки 2ГИС в архиве (utils/snapshots.py), из которого взяты данные
+    snapshot_sha: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
 
     __table_args__ = (
-        UniqueConstraint("area_id", "street", "house_number", name="uk_house"),
+        UniqueConstraint("area_id", "address_key", name="uk_house"),
     )
 
     area = relationship("Area", back_populates="houses")
@@ -205,6 +213,19 @@ class EntranceFlatsRange(Base):
     entrance = relationship("HouseEntrance", back_populates="flats_ranges")
 
 
+class HouseTrigram(Base):
+    """
+    Триграммы нормализованной улицы дома (utils/address_norm.street_trigrams)
+    для нечёткого поиска: первичный ключ начинается с trigram и служит индексом.
+    """
+    __tablename__ = "house_trigrams"
+
+    trigram: Mapped[str] = mapped_column(String(3), primary_key=True)
+    house_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("houses.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+
+
 class EntranceEquipment(Base):
     __tablename__ = "entrance_equipment"
 
@@ -282,6 +303,7 @@ class HousingOffice(Base):
     working_hours: Mapped[str] = mapped_column(String(100), default="")
     phone: Mapped[str] = mapped_column(String(50), default="")
     email: Mapped[str] = mapped_column(String(100), default="")
+    snapshot_sha: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=msk_now)
 
     city = relationship("City")
@@ -292,3 +314,53 @@ class HousingOffice(Base):
     )
 
 
+class ScrapeCache(Base):
+    __tablename__ = "scrape_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # sha256 от (kind, city_url, normalized query) — сам ключ слишком длинный для индекса
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    city_url: Mapped[str] = mapped_column(String(500), nullable=False)
+    # Читаемый запрос только для отладки, ищут по key_hash; Text — длина ввода пользователя не ограничена
+    query: Mapped[str] = mapped_column(Text, nullable=False)
+    # JSON результата парсинга; NULL — «не найдено в 2ГИС»
+    payload: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=msk_now)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    zone_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("zones.id", ondelete="CASCADE"), nullable=False
+    )
+    query: Mapped[str] = mapped_column(String(255), nullable=False)
+    # pending / running / done / failed
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending", index=True)
+    # Контрольная точка: последняя полностью обработанная страница выдачи
+    last_page: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    found: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    saved: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    # Куда писать прогресс: сообщение администратора, запустившего обход
+    status_chat_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    status_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    created_by: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.id"), nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=msk_now)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=msk_now, onupdate=msk_now
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    zone = relationship("Zone")
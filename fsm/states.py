@@ -19,12 +19,14 @@ class AddGKSFSM(StatesGroup):
 
 class FindHouseFSM(StatesGroup):
     waiting_for_address = State()
+    lookup_in_progress = State()
     confirming_add = State()
     waiting_for_city_auto = State()
 
 
 class AddHousingOffice2GISFSM(StatesGroup):
     waiting_for_name = State()
+    lookup_in_progress = State()
     confirming_add = State()
 
 
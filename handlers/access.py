@@ -6,9 +6,11 @@ from fsm.states import AccessRequest
 from keyboards.inline import select_role_keyboard, build_approval_keyboard
 from utils.messages import build_access_request_message
 
-from db.db import async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from db.models import User
 from db.crud.users import (
-    get_user_by_id,
     get_super_admin,
     get_rn_by_branch,
     get_rgks_by_area,
@@ -50,85 +52,82 @@ async def handle_role_selection(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(AccessRequest.entering_area)
-async def handle_area_input(message: Message, state: FSMContext):
+async def handle_area_input(message: Message, state: FSMContext, session: AsyncSession, user: Optional[User]):
     data = await state.get_data()
     role_id = data["role_id"]
 
-    async with async_session() as session:
-        user = await get_user_by_id(session, message.from_user.id)
-        await state.clear()
+    await state.clear()
+
+    if user is None:
+        await message.answer(
+            "❌ Ошибка: ваш аккаунт не найден в базе данных. Пожалуйста, зарегистрируйтесь."
+        )
+        return
+
+    area_input = message.text.strip()
+
+    # Запрос от РН → супер-админ
+    if role_id == ROLES["role_rn"]:
+        branch = await get_branch_by_id(session, area_input)
+        if not branch:
+            await message.answer("❌ Филиал не найден.")
+            return
 
-        if user is None:
-            await message.answer(
-                "❌ Ошибка: ваш аккаунт не найден в базе данных. Пожалуйста, зарегистрируйтесь."
+        admin = await get_super_admin(session)
+        if admin:
+            await message.bot.send_message(
+                chat_id=admin.id,
+                text=build_access_request_message(user, "РН", area_input),
+                reply_markup=build_approval_keyboard(user.id, role_id, area_input)
             )
+            await message.answer("✅ Запрос отправлен администратору.")
+        else:
+            await message.answer("⚠️ Главный администратор не найден.")
+
+    # Запрос от РГКС → РН
+    elif role_id == ROLES["role_rgks"]:
+        area = await get_area_by_id(session, area_input)
+        if not area:
+            await message.answer("❌ Участок не найден.")
             return
 
-        area_input = message.text.strip()
-
-        # Запрос от РН → супер-админ
-        if role_id == ROLES["role_rn"]:
-            branch = await get_branch_by_id(session, area_input)
-            if not branch:
-                await message.answer("❌ Филиал не найден.")
-                return
-
-            admin = await get_super_admin(session)
-            if admin:
-                await message.bot.send_message(
-                    chat_id=admin.id,
-                    text=build_access_request_message(user, "РН", area_input),
-                    reply_markup=build_approval_keyboard(user.id, role_id, area_input)
-                )
-                await message.answer("✅ Запрос отправлен администратору.")
-            else:
-                await message.answer("⚠️ Главный администратор не найден.")
-
-        # Запрос от РГКС → РН
-        elif role_id == ROLES["role_rgks"]:
-            area = await get_area_by_id(session, area_input)
-            if not area:
-                await message.answer("❌ Участок не найден.")
-                return
-
-            branch_id = area_input.split(".")[0]
-            target = await get_rn_by_branch(session, branch_id)
-            if target:
-                await message.bot.send_message(
-                    chat_id=target.id,
-                    text=build_access_request_message(user, "РГКС", area_input),
-                    reply_markup=build_approval_keyboard(user.id, role_id, area_input)
-                )
-                await message.answer("✅ Запрос отправлен руководителю направления.")
-            else:
-                await message.answer("⚠️ РН филиала не найден.")
-
-        # Запрос от СИ → РГКС
-        elif role_id == ROLES["role_si"]:
-            area = await get_area_by_id(session, area_input)
-            if not area:
-                await message.answer("❌ Участок не найден.")
-                return
-
-            target = await get_rgks_by_area(session, area_input)
-            if target:
-                await message.bot.send_message(
-                    chat_id=target.id,
-                    text=build_access_request_message(user, "СИ", area_input),
-                    reply_markup=build_approval_keyboard(user.id, role_id, area_input)
-                )
-                await message.answer("✅ Запрос отправлен руководителю группы.")
-            else:
-                await message.answer("⚠️ РГКС участка не найден.")
+        branch_id = area_input.split(".")[0]
+        target = await get_rn_by_branch(session, branch_id)
+        if target:
+            await message.bot.send_message(
+                chat_id=target.id,
+                text=build_access_request_message(user, "РГКС", area_input),
+                reply_markup=build_approval_keyboard(user.id, role_id, area_input)
+            )
+            await message.answer("✅ Запрос отправлен руководителю направления.")
+        else:
+            await message.answer("⚠️ РН филиала не найден.")
+
+    # Запрос от СИ → РГКС
+    elif role_id == ROLES["role_si"]:
+        area = await get_area_by_id(session, area_input)
+        if not area:
+            await message.answer("❌ Участок не найден.")
+            return
+
+        target = await get_rgks_by_area(session, area_input)
+        if target:
+            await message.bot.send_message(
+                chat_id=target.id,
+                text=build_access_request_message(user, "СИ", area_input),
+                reply_markup=build_approval_keyboard(user.id, role_id, area_input)
+            )
+            await message.answer("✅ Запрос отправлен руководителю группы.")
+        else:
+            await message.answer("⚠️ РГКС участка не найден.")
 
 
 @router.callback_query(F.data.startswith("approve:"))
-async def handle_approve(callback: CallbackQuery):
+async def handle_approve(callback: CallbackQuery, session: AsyncSession):
     _, user_id, role_id, area = callback.data.split(":")
     user_id, role_id = int(user_id), int(role_id)
 
-    async with async_session() as session:
-        await set_user_role(session, user_id, role_id, area)
+    await set_user_role(session, user_id, role_id, area)
 
     await callback.message.edit_text("✅ Доступ одобрен.")
     await callback.bot.send_message(user_id, "🎉 Ваша заявка на доступ одобрена!")
@@ -3,7 +3,7 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 
 from fsm.states import AddGKSFSM
-from db.db import async_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.crud.areas import get_area_by_id, create_area
 from db.crud.branches import get_all_branches
 from keyboards.inline import get_regions_gks_keyboard, get_admin_menu
@@ -11,9 +11,8 @@ from keyboards.inline import get_regions_gks_keyboard, get_admin_menu
 router = Router()
 
 @router.callback_query(F.data == "admin:add_gks")
-async def start_add_gks(callback: CallbackQuery, state: FSMContext):
-    async with async_session() as session:
-        regions = await get_all_branches(session)
+async def start_add_gks(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    regions = await get_all_branches(session)
     await callback.message.edit_text(
         "Выберите регион (филиал) для ГКС:",
         reply_markup=get_regions_gks_keyboard(regions)
@@ -32,7 +31,7 @@ async def select_gks_region(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.message(AddGKSFSM.waiting_for_number)
-async def add_gks_number(message: Message, state: FSMContext):
+async def add_gks_number(message: Message, state: FSMContext, session: AsyncSession):
     number = message.text.strip()
     if not number.isdigit() or int(number) <= 0:
         await message.answer("⚠️ Введите только положительное число, например: 2")
@@ -41,11 +40,10 @@ async def add_gks_number(message: Message, state: FSMContext):
     branch_id = data["branch_id"]
     area_id = f"{branch_id}.{number}"
     name = f"ГКС {number}"
-    async with async_session() as session:
-        if await get_area_by_id(session, area_id):
-            await message.answer(f"⚠️ Участок с ID <b>{area_id}</b> уже существует для этого региона!")
-            return
-        await create_area(session=session, area_id=area_id, name=name, branch_id=branch_id)
+    if await get_area_by_id(session, area_id):
+        await message.answer(f"⚠️ Участок с ID <b>{area_id}</b> уже существует для этого региона!")
+        return
+    await create_area(session=session, area_id=area_id, name=name, branch_id=branch_id)
 
     await message.answer(f"✅ <b>{name}</b> (участок: {area_id}, филиал: {branch_id}) добавлен.", reply_markup=get_admin_menu())
     await state.clear()
@@ -1,11 +1,55 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
-from keyboards.inline import get_admin_menu
+from keyboards.inline import get_admin_menu, get_scrape_stats_keyboard, get_parser_stages_keyboard
 from aiogram.fsm.context import FSMContext
+from typing import Optional
+from db.models import User
+from utils.messages import build_scrape_stats_message, build_parser_stages_message
+from utils.parser_pool import parser_pool
+from utils.scrape_queue import scrape_scheduler
+from utils.scrape_cache import scrape_cache
+from utils.singleflight import scrape_flights
+from utils.scrape_jobs import scrape_jobs
+from utils.parser_workers import parser_workers
+from utils.rate_limit import dgis_breaker, dgis_limiter
+from utils.house_refresher import house_refresher
+from utils.metrics import parser_metrics
+from datetime import datetime
 
 router = Router()
 
 
 @router.callback_query(F.data == "admin_panel")
 async def open_admin_menu(callback: CallbackQuery):
-    await callback.message.edit_text("🛠 Меню администрирования:", reply_markup=get_admin_menu())
\ No newline at end of file
+    await callback.message.edit_text("🛠 Меню администрирования:", reply_markup=get_admin_menu())
+
+
+@router.callback_query(F.data == "admin:scrape_stats")
+async def show_scrape_stats(callback: CallbackQuery, user: Optional[User]):
+    if not user or user.role_id >= 30:
+        await callback.message.answer("❌ Нет доступа.")
+        await callback.answer()
+        return
+    # С процессами парсера пул бота простаивает — его счётчики только сбивали бы с толку
+    pool = None if parser_workers.enabled else parser_pool.stats()
+    text = build_scrape_stats_message(
+        scrape_scheduler.stats(), pool, scrape_cache.stats(), scrape_flights.stats(),
+        scrape_jobs.stats(), parser_workers.stats(), dgis_breaker.stats(), dgis_limiter.stats(),
+        house_refresher.stats()
+    )
+    # Время в тексте, чтобы «Обновить» всегда менял сообщение
+    text += f"\n\n🕓 {datetime.now().strftime('%H:%M:%S')}"
+    await callback.message.edit_text(text, reply_markup=get_scrape_stats_keyboard())
+    await callback.answer()
+
+
+@router.callback_query(F.data == "admin:parser_stages")
+async def show_parser_stages(callback: CallbackQuery, user: Optional[User]):
+    if not user or user.role_id >= 30:
+        await callback.message.answer("❌ Нет доступа.")
+        await callback.answer()
+        return
+    text = build_parser_stages_message(parser_metrics.snapshot(), parser_metrics.lookups)
+    text += f"\n\n🕓 {datetime.now().strftime('%H:%M:%S')}"
+    await callback.message.edit_text(text, reply_markup=get_parser_stages_keyboard())
+    await callback.answer()
@@ -2,19 +2,36 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
 from fsm.states import FindHouseFSM
 from db.db import async_session
-from db.crud.users import get_user_by_id, set_default_city_for_user
-from db.crud.houses import get_house_by_address, get_house_by_id
+from db.models import User
+from db.crud.users import set_default_city_for_user
+from db.crud.houses import (
+    get_house_by_address_in_zones,
+    get_house_by_id,
+    get_house_with_details,
+    find_house_candidates,
+    touch_house_lookup,
+)
 from db.crud.housing_offices import get_housing_office_by_id, create_housing_office
 from db.crud.parsed_houses import save_parsed_house_to_db
-from db.crud.parsed_houses import get_house_parsed_view
+from db.crud.parsed_houses import build_house_parsed_view
 from db.crud.zones import get_zones_by_area_and_city
 from db.crud.cities import get_cities_by_area, get_city_by_id, get_cities_by_branch
-from keyboards.inline import get_confirm_add_keyboard, get_list_houses_menu, get_house_cities_keyboard
+from keyboards.inline import (
+    get_confirm_add_keyboard,
+    get_list_houses_menu,
+    get_house_cities_keyboard,
+    get_house_candidates_keyboard,
+)
 from utils.messages import build_house_address_info
 from utils.parser import parse_house_from_2gis
+from utils.scrape_jobs import scrape_jobs
 from utils.address import detect_city_and_zone_by_address
+from utils.address_norm import split_street_and_number
 
 from utils.messages import build_parsed_house_info
 
@@ -25,41 +42,36 @@ router = Router()
 
 
 @router.callback_query(F.data == "find_house")
-async def start_find_house(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    async with async_session() as session:
-        user = await get_user_by_id(session, user_id)
-        if not user or not user.area_id or user.role_id > 30:
-            await callback.message.answer("❌ Нет доступа.")
-            await callback.answer()
-            return
-        if not user.default_city_id:
-            # Нет города — предлагаем выбрать
-            cities = await get_cities_by_branch(session, user.branch_id)
-            await callback.message.answer(
-                "Выберите город по умолчанию для поиска:",
-                reply_markup=get_house_cities_keyboard(cities)
-            )
-            await state.set_state(FindHouseFSM.waiting_for_city_auto)
-            await callback.answer()
-            return
-        # город уже выбран — продолжаем обычную логику
-        await state.update_data(city_id=user.default_city_id, area_id=user.area_id)
+async def start_find_house(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: Optional[User]):
+    if not user or not user.area_id or user.role_id > 30:
+        await callback.message.answer("❌ Нет доступа.")
+        await callback.answer()
+        return
+    if not user.default_city_id:
+        # Нет города — предлагаем выбрать
+        cities = await get_cities_by_branch(session, user.branch_id)
         await callback.message.answer(
-            "🏘 Введите адрес дома в формате:\n"
-            "<b>Улица Номер</b> (пример: <b>Тимирязева 4</b>)"
+            "Выберите город по умолчанию для поиска:",
+            reply_markup=get_house_cities_keyboard(cities)
         )
-        await state.set_state(FindHouseFSM.waiting_for_address)
+        await state.set_state(FindHouseFSM.waiting_for_city_auto)
         await callback.answer()
+        return
+    # город уже выбран — продолжаем обычную логику
+    await state.update_data(city_id=user.default_city_id, area_id=user.area_id)
+    await callback.message.answer(
+        "🏘 Введите адрес дома в формате:\n"
+        "<b>Улица Номер</b> (пример: <b>Тимирязева 4</b>)"
+    )
+    await state.set_state(FindHouseFSM.waiting_for_address)
+    await callback.answer()
 
 
 @router.callback_query(FindHouseFSM.waiting_for_city_auto, F.data.startswith("find_house_city_"))
-async def set_default_city_and_continue(callback: CallbackQuery, state: FSMContext):
+async def set_default_city_and_continue(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     city_id = int(callback.data.replace("find_house_city_", ""))
-    user_id = callback.from_user.id
-    async with async_session() as session:
-        await set_default_city_for_user(session, user_id, city_id)
-        user = await get_user_by_id(session, user_id)
+    # Строка user уже в сессии — set_default_city_for_user меняет её же, перечитывать не нужно
+    await set_default_city_for_user(session, user.id, city_id)
     await state.update_data(city_id=city_id, area_id=user.area_id)
     await callback.message.answer(
         "🏘 Введите адрес дома в формате:\n"
@@ -70,151 +82,246 @@ async def set_default_city_and_continue(callback: CallbackQuery, state: FSMConte
 
 
 @router.message(FindHouseFSM.waiting_for_address)
-async def input_address(message: Message, state: FSMContext):
+async def input_address(message: Message, state: FSMContext, session: AsyncSession):
     data = await state.get_data()
     area_id = data["area_id"]
     city_id = data["city_id"]
 
-    parts = message.text.replace(",", " ").split()
-    if len(parts) < 2:
+    street, house_number = split_street_and_number(message.text)
+    if not street or not house_number:
         await message.answer(
             "⚠️ Неверный формат.\nВведите <b>улицу и номер дома</b> одним сообщением.\n"
             "Пример: <b>Тимирязева 4</b>"
         )
         return
 
-    street = " ".join(parts[:-1])
-    house_number = parts[-1]
+    # Получаем все районы (zones) для выбранного города и area_id пользователя
+    zones = await get_zones_by_area_and_city(session, area_id=area_id, city_id=city_id)
+    if not zones:
+        await message.answer("❌ Ваша ГКС не обслуживает этот город.")
+        await state.clear()
+        return
+    zone_ids = [z.id for z in zones]
+
+    # Ищем дом сразу по ВСЕМ районам в зоне ответственности пользователя
+    house = await get_house_by_address_in_zones(
+        session=session,
+        area_id=area_id,
+        zone_ids=zone_ids,
+        street=street,
+        house_number=house_number
+    )
 
-    async with async_session() as session:
-        # Получаем все районы (zones) для выбранного города и area_id пользователя
-        zones = await get_zones_by_area_and_city(session, area_id=area_id, city_id=city_id)
-        if not zones:
-            await message.answer("❌ Ваша ГКС не обслуживает этот город.")
-            await state.clear()
-            return
-        zone_ids = [z.id for z in zones]
-
-        # Ищем дом по ВСЕМ районам в зоне ответственности пользователя
-        house = None
-        found_zone = None
-        for zone_id in zone_ids:
-            house = await get_house_by_address(
-                session=session,
-                area_id=area_id,
-                zone_id=zone_id,
-                street=street,
-                house_number=house_number
-            )
-            if house:
-                found_zone = zone_id
-                break
-
-        if house is not None:
-            parsed = await get_house_parsed_view(session, house.id)
-            if not parsed:
-                await message.answer("⚠️ Не удалось получить данные о доме.")
-                await state.clear()
-                return
-
-            # Можно найти имя зоны (района) для вывода
-            zone_obj = next((z for z in zones if z.id == found_zone), None)
-            zone_name = zone_obj.name if zone_obj else "—"
-
-            text = build_parsed_house_info(
-                parsed_data=parsed,
-                db_city_name=parsed["address"].split(",")[0].strip(),
-                db_zone_name=zone_name,
-                notes=parsed["notes"],
-                updated_at=parsed["updated_at"],
-                jeu_address=parsed["jeu_address"]
-            )
-            markup = get_list_houses_menu(housing_office_id=house.housing_office_id, house_id=house.id)
-            await message.answer(text, reply_markup=markup)
-            await state.clear()
-            return
-
-        # === Дом не найден в базе, парсим с 2ГИС ===
-        city = await get_city_by_id(session, city_id)
-        await message.answer("🔍 Дом не найден в базе, ищем в 2ГИС...")
-
-        info = await parse_house_from_2gis(
-            city_url=city.url,
-            search_query=f"{street} {house_number}"
+    if house is not None:
+        # commit внутри touch_house_lookup заодно возвращает соединение в пул до ответа в Telegram
+        await touch_house_lookup(session, house.id)
+        await _send_house_card(message, house)
+        await state.clear()
+        return
+
+    # Опечатка или часть названия: сначала предлагаем похожие дома из базы, а не 2ГИС
+    candidates = await find_house_candidates(session, area_id, zone_ids, street, house_number)
+    if candidates:
+        await session.commit()
+        await state.update_data(street=street, house_number=house_number, zone_ids=zone_ids)
+        await message.answer(
+            "🔎 Точного совпадения нет. Возможно, вы искали:",
+            reply_markup=get_house_candidates_keyboard(candidates)
         )
-        if info is None:
-            await message.answer("❌ Дом не найден в 2ГИС.")
-            await state.clear()
-            return
+        return
 
-        # Определяем город и район по адресу (из info)
-        city_obj, zone_obj = await detect_city_and_zone_by_address(session, info.get("address", ""))
+    # === Дом не найден в базе, парсим с 2ГИС ===
+    city = await get_city_by_id(session, city_id)
+    # Соединение не должно ждать ни Telegram, ни 2ГИС: результат парсинга
+    # сохраняется в отдельной короткой сессии в _finish_house_lookup
+    await session.commit()
+
+    status = await message.answer("🔍 Дом не найден в базе, ищем в 2ГИС...")
+    await _submit_house_lookup(status, state, city.url, message.from_user.id, area_id, city_id, zone_ids, street, house_number)
+
+
+@router.message(FindHouseFSM.lookup_in_progress)
+async def lookup_in_progress(message: Message):
+    await message.answer("⏳ Поиск дома в 2ГИС ещё идёт. Дождитесь результата.")
+
+
+@router.callback_query(F.data.startswith("house_pick:"))
+async def pick_house_candidate(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: Optional[User]):
+    house_id = int(callback.data.split(":")[1])
+    house = await get_house_with_details(session, house_id)
+    if house is None:
+        await callback.answer("⚠️ Дом не найден.", show_alert=True)
+        return
+    # house_id приходит из callback — показываем только дома из районов, которые предлагали этому пользователю
+    data = await state.get_data()
+    if not user or house.area_id != user.area_id or house.zone_id not in data.get("zone_ids", []):
+        await callback.answer("❌ Нет доступа к этому дому.", show_alert=True)
+        return
+    await touch_house_lookup(session, house.id)
+    await _send_house_card(callback.message, house)
+    await state.clear()
+    await callback.answer()
 
-        if city_obj is None or city_obj.id != city_id:
-            await message.answer("❌ Город из 2ГИС не совпадает с выбранным городом пользователя.")
-            await state.clear()
-            return
-
-        if zone_obj is None or zone_obj.id not in zone_ids:
-            await message.answer("❌ Район этого дома не входит в вашу зону ответственности.")
-            await state.clear()
-            return
-
-        # Разбор title для улицы и номера
-        title = info.get('title', '')
-        if ',' in title:
-            street_part, number_part = title.rsplit(',', 1)
-            parsed_street = street_part.replace('Улица', '').strip()
-            parsed_house_number = number_part.strip()
-        else:
-            parsed_street = street
-            parsed_house_number = house_number
-
-        entrances_count = int(re.search(r'(\d+)', info.get('entrances', '')).group(1)) if re.search(r'(\d+)', info.get('entrances', '')) else 1
-        floors_count = int(re.search(r'(\d+)', info.get('floors', '')).group(1)) if re.search(r'(\d+)', info.get('floors', '')) else 1
-
-        entrance_info = {}
-        for item in info.get('apartments', []):
-            parts = item.split(": квартиры ")
-            if len(parts) == 2:
-                entrance_number = int(parts[0].split()[0])
-                flats = parts[1].strip()
-                entrance_info[entrance_number] = flats
-
-        text = build_house_address_info(
-            city_name=city_obj.name,
-            zone_name=zone_obj.name if zone_obj else 'Без района',
-            street=parsed_street,
-            house_number=parsed_house_number,
-            floors=floors_count,
-            entrances=entrances_count,
-            entrance_info=entrance_info,
-            notes="Добавлено с 2ГИС",
-            updated_at=datetime.now().strftime("%d.%m.%Y %H:%M")
-        )
 
-        await message.answer(text, reply_markup=get_confirm_add_keyboard())
-
-        await state.update_data(
-                parsed_house = {
-                "title": f"{parsed_street} {parsed_house_number}",
-                "floors": f"{floors_count} этажей",
-                "entrances": f"{entrances_count} подъездов",
-                "apartments": [
-                    f"{entrance_num} подъезд: квартиры {flats_str}"
-                    for entrance_num, flats_str in entrance_info.items()
-                ],
-                "area_id": area_id,
-                "zone_id": zone_obj.id if zone_obj else None,
-                "notes": "Добавлено с 2ГИС",
-            },
+@router.callback_query(FindHouseFSM.lookup_in_progress, F.data == "house_search_2gis")
+async def search_house_in_progress(callback: CallbackQuery):
+    await callback.answer("⏳ Поиск в 2ГИС уже идёт")
+
+
+# Повторное нажатие кнопки во время поиска ловит обработчик выше: состояние уже lookup_in_progress
+@router.callback_query(FindHouseFSM.waiting_for_address, F.data == "house_search_2gis")
+async def search_house_in_2gis(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    data = await state.get_data()
+    if "street" not in data:
+        await callback.message.answer("⚠️ Данные не найдены. Повторите поиск.")
+        await callback.answer()
+        return
+
+    city = await get_city_by_id(session, data["city_id"])
+    await session.commit()
+
+    status = await callback.message.answer("🔍 Ищем дом в 2ГИС...")
+    await _submit_house_lookup(
+        status, state, city.url, callback.from_user.id, data["area_id"], data["city_id"],
+        data["zone_ids"], data["street"], data["house_number"]
+    )
+    await callback.answer()
+
+
+async def _send_house_card(message: Message, house):
+    parsed = build_house_parsed_view(house)
+    text = build_parsed_house_info(
+        parsed_data=parsed,
+        db_city_name=parsed["address"].split(",")[0].strip(),
+        db_zone_name=house.zone.name if house.zone else "—",
+        notes=parsed["notes"],
+        updated_at=parsed["updated_at"],
+        jeu_address=parsed["jeu_address"]
+    )
+    markup = get_list_houses_menu(housing_office_id=house.housing_office_id, house_id=house.id)
+    await message.answer(text, reply_markup=markup)
+
+
+async def _submit_house_lookup(
+    status: Message,
+    state: FSMContext,
+    city_url: str,
+    user_id: int,
+    area_id: int,
+    city_id: int,
+    zone_ids: list,
+    street: str,
+    house_number: str
+):
+    # Парсинг идёт в фоне: обработчик сразу освобождается, статус обновляется по ходу
+    async def run(progress):
+        async def notify_queue(position: int, eta: float):
+            await progress(f"⏳ Вы №{position} в очереди, ~{eta:.0f} с")
+
+        async def notify_started():
+            await progress("🔍 Ищем дом в 2ГИС...")
+
+        return await parse_house_from_2gis(
+            city_url=city_url,
+            search_query=f"{street} {house_number}",
+            user_id=user_id,
+            on_queued=notify_queue,
+            on_started=notify_started
         )
 
-        await state.set_state(FindHouseFSM.confirming_add)
+    async def on_result(info):
+        await _finish_house_lookup(status, state, info, area_id, city_id, zone_ids, street, house_number)
+
+    # Пока идёт поиск, новые адреса не принимаются — ответ пришёл бы к чужому статусу
+    await state.set_state(FindHouseFSM.lookup_in_progress)
+    scrape_jobs.submit(status, run, on_result, on_failure=state.clear)
+
+
+async def _finish_house_lookup(
+    status: Message,
+    state: FSMContext,
+    info,
+    area_id: int,
+    city_id: int,
+    zone_ids: list,
+    street: str,
+    house_number: str
+):
+    if info is None:
+        await scrape_jobs.edit(status, "❌ Дом не найден в 2ГИС.")
+        await state.clear()
+        return
+
+    # Определяем город и район по адресу (из info)
+    async with async_session() as session:
+        city_obj, zone_obj = await detect_city_and_zone_by_address(session, info.get("address", ""))
+
+    if city_obj is None or city_obj.id != city_id:
+        await scrape_jobs.edit(status, "❌ Город из 2ГИС не совпадает с выбранным городом пользователя.")
+        await state.clear()
+        return
+
+    if zone_obj is None or zone_obj.id not in zone_ids:
+        await scrape_jobs.edit(status, "❌ Район этого дома не входит в вашу зону ответственности.")
+        await state.clear()
+        return
+
+    # Разбор title для улицы и номера
+    title = info.get('title', '')
+    if ',' in title:
+        street_part, number_part = title.rsplit(',', 1)
+        parsed_street = street_part.replace('Улица', '').strip()
+        parsed_house_number = number_part.strip()
+    else:
+        parsed_street = street
+        parsed_house_number = house_number
+
+    entrances_count = int(re.search(r'(\d+)', info.get('entrances', '')).group(1)) if re.search(r'(\d+)', info.get('entrances', '')) else 1
+    floors_count = int(re.search(r'(\d+)', info.get('floors', '')).group(1)) if re.search(r'(\d+)', info.get('floors', '')) else 1
+
+    entrance_info = {}
+    for item in info.get('apartments', []):
+        parts = item.split(": квартиры ")
+        if len(parts) == 2:
+            entrance_number = int(parts[0].split()[0])
+            flats = parts[1].strip()
+            entrance_info[entrance_number] = flats
+
+    text = build_house_address_info(
+        city_name=city_obj.name,
+        zone_name=zone_obj.name if zone_obj else 'Без района',
+        street=parsed_street,
+        house_number=parsed_house_number,
+        floors=floors_count,
+        entrances=entrances_count,
+        entrance_info=entrance_info,
+        notes="Добавлено с 2ГИС",
+        updated_at=datetime.now().strftime("%d.%m.%Y %H:%M")
+    )
+
+    await scrape_jobs.edit(status, text, reply_markup=get_confirm_add_keyboard())
+
+    await state.update_data(
+            parsed_house = {
+            "title": f"{parsed_street} {parsed_house_number}",
+            "floors": f"{floors_count} этажей",
+            "entrances": f"{entrances_count} подъездов",
+            "apartments": [
+                f"{entrance_num} подъезд: квартиры {flats_str}"
+                for entrance_num, flats_str in entrance_info.items()
+            ],
+            "area_id": area_id,
+            "zone_id": zone_obj.id if zone_obj else None,
+            "notes": "Добавлено с 2ГИС",
+            "snapshot_sha": info.get("snapshot_sha"),
+        },
+    )
+
+    await state.set_state(FindHouseFSM.confirming_add)
 
 
 @router.callback_query(F.data == "confirm_add_house")
-async def confirm_add_house(callback: CallbackQuery, state: FSMContext):
+async def confirm_add_house(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     user_id = callback.from_user.id
     data = await state.get_data()
     parsed = data.get("parsed_house")
@@ -225,24 +332,24 @@ async def confirm_add_house(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
 
-    async with async_session() as session:
-        house_id = await save_parsed_house_to_db(
-            session=session,
-            parsed_data={
-                "title": f"{parsed['street']} {parsed['house_number']}",
-                "floors": f"{parsed['floors']} этажей",
-                "entrances": f"{parsed['entrances']} подъездов",
-                "apartments": [
-                    f"{k} подъезд: квартиры {v}"
-                    for k, v in parsed["entrance_info"].items()
-                ],
-                "address": parsed.get("notes", "")
-            },
-            area_id=data["area_id"],
-            zone_id=parsed["zone_id"],
-            created_by=user_id,
-            notes=parsed.get("notes", "")
-        )
+    house_id = await save_parsed_house_to_db(
+        session=session,
+        parsed_data={
+            "title": f"{parsed['street']} {parsed['house_number']}",
+            "floors": f"{parsed['floors']} этажей",
+            "entrances": f"{parsed['entrances']} подъездов",
+            "apartments": [
+                f"{k} подъезд: квартиры {v}"
+                for k, v in parsed["entrance_info"].items()
+            ],
+            "address": parsed.get("notes", ""),
+            "snapshot_sha": parsed.get("snapshot_sha")
+        },
+        area_id=data["area_id"],
+        zone_id=parsed["zone_id"],
+        created_by=user_id,
+        notes=parsed.get("notes", "")
+    )
 
     await callback.message.answer("✅ Дом успешно добавлен в базу данных!", reply_markup=get_list_houses_menu())
     await state.clear()
@@ -250,27 +357,25 @@ async def confirm_add_house(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(FindHouseFSM.confirming_add, F.data == "add_housing_office_confirm")
-async def confirm_add(callback: CallbackQuery, state: FSMContext):
+async def confirm_add(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     data = await state.get_data()
     result = data["parsed"]
 
-    async with async_session() as session:
-        user = await get_user_by_id(session, callback.from_user.id)
-        zone = await get_zone_by_area(session, user.area_id)
-        city = zone.city
-
-        await create_housing_office(
-            session=session,
-            name=result.get("title", ""),
-            address=result.get("address", ""),
-            city_id=city.id,
-            zone_id=zone.id,
-            comments=result.get("comments", ""),
-            working_hours=result.get("working_hours", ""),
-            phone=result.get("phone", ""),
-            email="",       
-            photo_url="",   
-        )
+    zone = await get_zone_by_area(session, user.area_id)
+    city = zone.city
+
+    await create_housing_office(
+        session=session,
+        name=result.get("title", ""),
+        address=result.get("address", ""),
+        city_id=city.id,
+        zone_id=zone.id,
+        comments=result.get("comments", ""),
+        working_hours=result.get("working_hours", ""),
+        phone=result.get("phone", ""),
+        email="",       
+        photo_url="",   
+    )
     await callback.message.edit_text("✅ ЖЭУ успешно добавлено!", reply_markup=get_admin_menu())
     await state.clear()
     await callback.answer()
@@ -2,28 +2,27 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from fsm.states import SettingsFSM
 from aiogram.types import CallbackQuery
-from db.crud.users import get_user_by_id, set_default_city_for_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from db.models import User
+from db.crud.users import set_default_city_for_user
 from db.crud.cities import get_cities_by_branch_id
 from keyboards.inline import get_setting_cities_keyboard
-from db.db import async_session
 
 router = Router()
 
 @router.callback_query(F.data == "settings")
-async def show_settings(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    async with async_session() as session:
-        user = await get_user_by_id(session, user_id)
-        if not user or not user.branch_id:
-            await callback.message.answer("❌ У вас не указан регион.")
-            await callback.answer()
-            return
+async def show_settings(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: Optional[User]):
+    if not user or not user.branch_id:
+        await callback.message.answer("❌ У вас не указан регион.")
+        await callback.answer()
+        return
 
-        cities = await get_cities_by_branch_id(session, user.branch_id)
-        if not cities:
-            await callback.message.answer("❌ В вашем регионе нет городов.")
-            await callback.answer()
-            return
+    cities = await get_cities_by_branch_id(session, user.branch_id)
+    if not cities:
+        await callback.message.answer("❌ В вашем регионе нет городов.")
+        await callback.answer()
+        return
 
     await callback.message.answer(
         "Выберите город по умолчанию для поиска:",
@@ -33,13 +32,11 @@ async def show_settings(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.callback_query(F.data.startswith("settings_city_"))
-async def set_default_city_settings(callback: CallbackQuery, state: FSMContext):
+async def set_default_city_settings(callback: CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     city_id = int(callback.data.replace("settings_city_", ""))
-    user_id = callback.from_user.id
-    async with async_session() as session:
-        await set_default_city_for_user(session, user_id, city_id)
-        user = await get_user_by_id(session, user_id)
-        cities = await get_cities_by_branch_id(session, user.branch_id)
+    # Строка user уже в сессии — set_default_city_for_user меняет её же, перечитывать не нужно
+    await set_default_city_for_user(session, user.id, city_id)
+    cities = await get_cities_by_branch_id(session, user.branch_id)
     await callback.message.edit_text(callback.message.text, reply_markup=get_setting_cities_keyboard(cities, current_city_id=user.default_city_id))
     await state.clear()
     await callback.answer()
@@ -64,6 +64,7 @@ def get_admin_menu() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="➕ Город", callback_data="add_city")],
         [InlineKeyboardButton(text="➕ Районы", callback_data="admin:add_zone")],
         [InlineKeyboardButton(text="➕ Добавить ЖЭУ", callback_data="add_housing_office")],
+        [InlineKeyboardButton(text="📊 Парсер 2ГИС", callback_data="admin:scrape_stats")],
         [InlineKeyboardButton(text="↩️ Назад", callback_data="start")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -77,6 +78,21 @@ def get_list_gks_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def get_scrape_stats_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin:scrape_stats")],
+        [InlineKeyboardButton(text="⏱ Этапы парсера", callback_data="admin:parser_stages")],
+        [InlineKeyboardButton(text="↩️ Назад", callback_data="admin_panel")],
+    ])
+
+
+def get_parser_stages_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin:parser_stages")],
+        [InlineKeyboardButton(text="↩️ Назад", callback_data="admin:scrape_stats")],
+    ])
+
+
 def get_confirm_add_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [
@@ -183,6 +199,18 @@ def get_areas_keyboard(areas: list) -> InlineKeyboardMarkup:
     )
 
 
+def get_house_candidates_keyboard(houses) -> InlineKeyboardMarkup:
+    keyboard = []
+    for house in houses:
+        text = f"🏠 {house.street} {house.house_number}"
+        if house.zone:
+            text += f" · {house.zone.name}"
+        keyboard.append([InlineKeyboardButton(text=text, callback_data=f"house_pick:{house.id}")])
+    keyboard.append([InlineKeyboardButton(text="🌐 Нет в списке — искать в 2ГИС", callback_data="house_search_2gis")])
+    keyboard.append([InlineKeyboardButton(text="↩️ Назад", callback_data="start")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
 def get_house_cities_keyboard(cities):
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -0,0 +1,42 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.orm import sessionmaker
+
+from db.crud.users import get_user_by_id
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Одна сессия БД на апдейт. Обработчик получает её как `session`, а строку
+    пользователя, отправившего апдейт, — как `user` (None, если он не зарегистрирован).
+    После обработчика изменения фиксируются, при исключении — откатываются.
+
+    Фоновые задачи, которые доделывают работу после ответа обработчика
+    (парсинг 2ГИС), открывают собственную сессию: эта к тому времени закрыта.
+    """
+
+    def __init__(self, session_pool: sessionmaker):
+        self.session_pool = session_pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.session_pool() as session:
+            from_user = data.get("event_from_user")
+            data["session"] = session
+            data["user"] = await get_user_by_id(session, from_user.id) if from_user else None
+            # Возвращаем соединение в пул: многим обработчикам дальше нужен только Telegram,
+            # а запросы обработчика возьмут соединение заново
+            await session.commit()
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            await session.commit()
+            return result
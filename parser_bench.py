@@ -0,0 +1,205 @@
+"""
+Запись и офлайн-прогон корпуса страниц 2ГИС для проверки DGisParser.
+
+    python parser_bench.py record          # нужна сеть: пишет HAR и эталоны в fixtures/2gis
+    python parser_bench.py run --repeat 5  # без сети: латентность p50/p95, IPC-вызовы, точность
+    python parser_bench.py run --save after.json
+    python parser_bench.py compare before.json after.json  # до/после по каждому типу кейса
+
+Кейсы с "synthetic": true прогоняются на собранных вручную страницах выдачи:
+они проверяют сам прогон и разбор выдачи, но не вёрстку 2ГИС. Карточки
+домов и организаций нужно записать командой record: run отказывается
+работать, пока в корпусе есть кейсы без HAR или эталона.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+from utils.parser_replay import CORPUS_DIR, load_cases, save_cases, har_path, har_parser
+
+
+logger = logging.getLogger("parser_bench")
+
+
+class IpcCounter:
+    """Считает сообщения Playwright-клиента к драйверу браузера (round trip'ы)."""
+
+    def __init__(self):
+        self.calls = 0
+
+
+@contextmanager
+def count_ipc():
+    counter = IpcCounter()
+    try:
+        from playwright._impl._connection import Channel
+    except ImportError:
+        # Внутренний модуль Playwright мог переехать — считаем без IPC
+        yield counter
+        return
+
+    original = Channel.send
+
+    async def send(self, *args, **kwargs):
+        counter.calls += 1
+        return await original(self, *args, **kwargs)
+
+    Channel.send = send
+    try:
+        yield counter
+    finally:
+        Channel.send = original
+
+
+async def run_case(parser, case: dict) -> dict:
+    kind = case["kind"]
+    if kind == "search":
+        results, is_direct = await parser.search_addresses(case["query"], case["city_url"])
+        return {"direct": is_direct, "titles": [r["title"] for r in results]}
+    if kind == "address":
+        return await parser.parse_address(case["url"])
+    if kind == "organization":
+        return await parser.parse_organization(case["url"])
+    raise ValueError(f"Неизвестный тип кейса: {kind}")
+
+
+async def resolve_card_url(parser, case: dict) -> Optional[str]:
+    """При записи находит карточку по запросу: открытую сразу или первую в выдаче."""
+    outcome = await parser.submit_search(case["query"], case["city_url"])
+    if outcome == "card":
+        return parser.page.url
+    if outcome == "results":
+        for block in await parser.extract_search_results():
+            if block["href"]:
+                return f"https://2gis.ru{block['href'].strip()}"
+    return None
+
+
+def accuracy(expected: dict, actual: dict) -> float:
+    if not expected:
+        return 0.0
+    matched = sum(1 for key, value in expected.items() if actual.get(key) == value)
+    return matched / len(expected)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+async def record(corpus_dir: str, headless: bool) -> None:
+    cases = load_cases(corpus_dir)
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=headless)
+        for case in cases:
+            logger.info("Записываем %s", case["name"])
+            async with har_parser(browser, har_path(case, corpus_dir), record=True) as parser:
+                if case["kind"] != "search":
+                    case["url"] = await resolve_card_url(parser, case)
+                    if not case["url"]:
+                        logger.warning("Карточка для %s не найдена", case["name"])
+                        continue
+                case["expected"] = await run_case(parser, case)
+            case.pop("synthetic", None)
+        await browser.close()
+    save_cases(cases, corpus_dir)
+
+
+def summarize(stats: Dict[str, Dict[str, list]]) -> Dict[str, dict]:
+    summary = {}
+    for kind, values in stats.items():
+        n = len(values["latency"])
+        summary[kind] = {
+            "n": n,
+            "p50": percentile(values["latency"], 0.5),
+            "p95": percentile(values["latency"], 0.95),
+            "ipc": sum(values["ipc"]) / n,
+            "accuracy": sum(values["accuracy"]) / n,
+        }
+    return summary
+
+
+async def run(corpus_dir: str, repeat: int, headless: bool, save: Optional[str] = None) -> None:
+    cases = load_cases(corpus_dir)
+    # Пропущенный кейс молча исказил бы сводку: без карточек нет и замеров parse_address/parse_organization
+    unrecorded = [
+        case["name"] for case in cases
+        if "expected" not in case or not os.path.exists(har_path(case, corpus_dir))
+    ]
+    if unrecorded:
+        raise SystemExit(
+            f"Кейсы не записаны: {', '.join(unrecorded)}. Запишите их (нужна сеть): python parser_bench.py record"
+        )
+    stats: Dict[str, Dict[str, list]] = {}
+
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=headless)
+        for case in cases:
+            for _ in range(repeat):
+                async with har_parser(browser, har_path(case, corpus_dir)) as parser:
+                    with count_ipc() as ipc:
+                        started = time.perf_counter()
+                        actual = await run_case(parser, case)
+                        elapsed = time.perf_counter() - started
+                kind = stats.setdefault(case["kind"], {"latency": [], "ipc": [], "accuracy": []})
+                kind["latency"].append(elapsed)
+                kind["ipc"].append(ipc.calls)
+                kind["accuracy"].append(accuracy(case["expected"], actual))
+        await browser.close()
+
+    summary = summarize(stats)
+    print(f"{'этап':<14}{'n':>4}{'p50, с':>9}{'p95, с':>9}{'IPC':>7}{'точность':>10}")
+    for kind, row in summary.items():
+        print(
+            f"{kind:<14}{row['n']:>4}{row['p50']:>9.2f}{row['p95']:>9.2f}"
+            f"{row['ipc']:>7.0f}{row['accuracy']:>10.0%}"
+        )
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Сводка до/после из двух файлов run --save: так считаются цифры для описания изменений."""
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{'этап':<14}{'p50 до':>9}{'p50 после':>11}{'p95 до':>9}{'p95 после':>11}")
+    for kind in sorted(set(before) & set(after)):
+        print(
+            f"{kind:<14}{before[kind]['p50']:>9.2f}{after[kind]['p50']:>11.2f}"
+            f"{before[kind]['p95']:>9.2f}{after[kind]['p95']:>11.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["record", "run", "compare"])
+    parser.add_argument("files", nargs="*", help="для compare: сводки до и после (run --save)")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--headful", action="store_true")
+    parser.add_argument("--save", help="записать сводку run в JSON")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(record(args.corpus, headless=not args.headful))
+    elif args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare ждёт два файла: до и после")
+        compare(*args.files)
+    else:
+        asyncio.run(run(args.corpus, args.repeat, headless=not args.headful, save=args.save))
+
+
+if __name__ == "__main__":
+    main()
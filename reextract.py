@@ -0,0 +1,132 @@
+"""
+Повторное извлечение данных из архива снимков 2ГИС — без сети, на всех ядрах.
+
+    python reextract.py                          # все снимки -> reextract.jsonl
+    python reextract.py --kind house --mode dom  # только дома, только по вёрстке
+    python reextract.py --apply                  # и обновить дома и ЖЭУ в БД
+
+После исправления селекторов в utils/parser.py достаточно перезапустить
+этот скрипт вместо повторного обхода 2ГИС.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from playwright.async_api import async_playwright
+
+from config import PARSER_EXTRACTION_MODE, PARSER_SNAPSHOT_DIR
+from utils.parser import DGisParser
+from utils.snapshots import SnapshotArchive
+
+
+logger = logging.getLogger("reextract")
+
+# Снимок статичен: если селектора нет сразу, его не будет и через 15 с
+OFFLINE_CARD_TIMEOUT = 1000
+
+Result = Tuple[str, str, Optional[dict]]
+
+
+async def extract_chunk_async(shas: List[str], root: str, kind: Optional[str], mode: str) -> List[Result]:
+    archive = SnapshotArchive(root)
+    results = []
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True)
+        # Скрипты 2ГИС из снимка не нужны и не должны ходить в сеть
+        context = await browser.new_context(java_script_enabled=False, viewport={"width": 1920, "height": 1080})
+        await context.route("**/*", lambda route: route.abort())
+        page = await context.new_page()
+        parser = DGisParser(page=page, extraction_mode=mode, snapshots=False)
+        parser.card_timeout = OFFLINE_CARD_TIMEOUT
+
+        for sha in shas:
+            snapshot = archive.load(sha)
+            if kind and snapshot["kind"] != kind:
+                continue
+            item = snapshot.get("item") if mode == "api" else None
+            try:
+                await page.set_content(snapshot["html"], wait_until="domcontentloaded")
+                if snapshot["kind"] == "house":
+                    info = await parser.extract_address(item)
+                else:
+                    info = await parser.extract_organization(item)
+            except Exception:
+                logger.exception("Не удалось разобрать снимок %s", sha)
+                info = None
+            results.append((sha, snapshot["kind"], info))
+        await browser.close()
+    return results
+
+
+def extract_chunk(shas: List[str], root: str, kind: Optional[str], mode: str) -> List[Result]:
+    return asyncio.run(extract_chunk_async(shas, root, kind, mode))
+
+
+def reextract(root: str, kind: Optional[str], mode: str, workers: int) -> List[Result]:
+    shas = list(SnapshotArchive(root).shas())
+    if not shas:
+        return []
+    # Кусков больше, чем процессов, чтобы медленные снимки не держали одно ядро
+    chunks = [shas[i::workers * 4] for i in range(min(len(shas), workers * 4))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_chunk, chunk, root, kind, mode) for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+
+async def apply(results: List[Result]) -> Tuple[int, int]:
+    from db.db import async_session
+    from db.crud.houses import get_houses_by_snapshot
+    from db.crud.housing_offices import get_housing_offices_by_snapshot, update_housing_office
+    from db.crud.parsed_houses import apply_parsed_house_diff
+    from utils.zone_crawler import house_title
+
+    houses = offices = 0
+    async with async_session() as session:
+        for sha, kind, info in results:
+            if not info or not info.get("title"):
+                continue
+            if kind == "house":
+                parsed = dict(info, title=house_title(info))
+                for house in await get_houses_by_snapshot(session, sha):
+                    if await apply_parsed_house_diff(session, house.id, parsed, house.updated_by):
+                        houses += 1
+            else:
+                for office in await get_housing_offices_by_snapshot(session, sha):
+                    await update_housing_office(
+                        session, office.id,
+                        working_hours=info.get("working_hours") or office.working_hours,
+                        phone=info.get("phone") or office.phone,
+                    )
+                    offices += 1
+    return houses, offices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive", default=PARSER_SNAPSHOT_DIR)
+    parser.add_argument("--kind", choices=["house", "organization"])
+    parser.add_argument("--mode", choices=["api", "dom"], default=PARSER_EXTRACTION_MODE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="reextract.jsonl")
+    parser.add_argument("--apply", action="store_true")
+    args = parser.parse_args()
+
+    results = reextract(args.archive, args.kind, args.mode, args.workers)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for sha, kind, info in results:
+            f.write(json.dumps({"sha": sha, "kind": kind, "info": info}, ensure_ascii=False) + "\n")
+
+    empty = sum(1 for _, _, info in results if not info or not info.get("title"))
+    print(f"Снимков: {len(results)}, без заголовка: {empty}, результат в {args.out}")
+
+    if args.apply:
+        houses, offices = asyncio.run(apply(results))
+        print(f"Обновлено домов: {houses}, ЖЭУ: {offices}")
+
+
+if __name__ == "__main__":
+    main()
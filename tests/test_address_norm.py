@@ -0,0 +1,29 @@
+import pytest
+
+from utils.address_norm import address_key, house_query_key, split_street_and_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Тимирязева 4", ("Тимирязева", "4")),
+    ("Тимирязева 4 корпус 2", ("Тимирязева", "4 корпус 2")),
+    ("8 Марта, 12", ("8 Марта", "12")),
+    ("ул. Тимирязева, д. 4", ("ул. Тимирязева", "д. 4")),
+    ("Тимирязева дом 4 корп. 2", ("Тимирязева", "дом 4 корп. 2")),
+    ("пр. Победы 5", ("пр. Победы", "5")),
+])
+def test_split_street_and_number(text, expected):
+    assert split_street_and_number(text) == expected
+
+
+@pytest.mark.parametrize("query, key", [
+    ("ул. Тимирязева, д. 4", "тимирязева|4"),
+    ("Тимирязева 4", "тимирязева|4"),
+    ("пр. Победы 5", "победы пр-т|5"),
+    ("проспект Победы, д. 5", "победы пр-т|5"),
+])
+def test_house_query_key(query, key):
+    assert house_query_key(query) == key
+
+
+def test_street_type_keeps_houses_apart():
+    assert address_key("пр. Победы", "5") != address_key("ул. Победы", "5")
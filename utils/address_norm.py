@@ -0,0 +1,117 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+
+# Тип улицы -> каноническое сокращение. «Улица» — тип по умолчанию: пользователи
+# его не пишут, поэтому в ключ он не попадает. Остальные типы сохраняются,
+# чтобы «пр-т Победы 5» и «ул. Победы 5» оставались разными домами.
+STREET_TYPES = {
+    "улица": "", "ул": "",
+    "проспект": "пр-т", "пр-т": "пр-т", "просп": "пр-т", "пр-кт": "пр-т", "пр": "пр-т",
+    "переулок": "пер", "пер": "пер",
+    "бульвар": "б-р", "б-р": "б-р", "бул": "б-р",
+    "шоссе": "ш", "ш": "ш",
+    "площадь": "пл", "пл": "пл",
+    "проезд": "пр-д", "пр-д": "пр-д",
+    "набережная": "наб", "наб": "наб",
+    "тупик": "туп", "туп": "туп",
+    "микрорайон": "мкр", "мкр": "мкр",
+}
+
+# Части номера дома: корпус, строение, литера (буква пишется слитно с номером)
+BUILDING_PARTS = {
+    "корпус": "к", "корп": "к", "к": "к",
+    "строение": "с", "стр": "с", "с": "с",
+    "литера": "", "литер": "", "лит": "",
+}
+
+HOUSE_WORDS = {"дом", "д"}
+
+
+def _tokens(text: str) -> List[str]:
+    text = text.lower().replace("ё", "е")
+    # Точки и запятые — разделители; дефис внутри «пр-т» и «б-р» сохраняем
+    text = re.sub(r"[.,;]+", " ", text)
+    return text.split()
+
+
+def normalize_street(street: str) -> str:
+    """«ул. Тимирязева» / «Тимирязева улица» -> «тимирязева», «проспект Победы» -> «победы пр-т»."""
+    words = []
+    street_type = ""
+    for token in _tokens(street):
+        if token in STREET_TYPES:
+            street_type = STREET_TYPES[token]
+        else:
+            words.append(token)
+    if street_type:
+        words.append(street_type)
+    return " ".join(words)
+
+
+def normalize_house_number(house_number: str) -> str:
+    """«д. 12 корп. 2» -> «12к2», «4 А» / «4, литера А» -> «4а», «5 стр.1» -> «5с1»."""
+    parts = []
+    for token in _tokens(house_number):
+        if token in HOUSE_WORDS:
+            continue
+        if token in BUILDING_PARTS:
+            parts.append(BUILDING_PARTS[token])
+            continue
+        # «к2», «стр1», «литА» написаны слитно: отделяем слово от номера
+        match = (
+            re.fullmatch(r"(корпус|корп|строение|стр|к|с)(\d\w*)", token)
+            or re.fullmatch(r"(литера|литер|лит)([а-я])", token)
+        )
+        if match:
+            parts.append(BUILDING_PARTS[match.group(1)])
+            parts.append(match.group(2))
+        else:
+            parts.append(token)
+    return "".join(parts)
+
+
+def address_key(street: str, house_number: str) -> str:
+    """Ключ дома для поиска и уникальности: одинаков для любых написаний одного адреса."""
+    return f"{normalize_street(street)}|{normalize_house_number(house_number)}"
+
+
+def street_trigrams(street: str) -> Set[str]:
+    """
+    Триграммы нормализованной улицы по словам, с отступом как в pg_trgm:
+    «тимир» -> {"  т", " ти", "тим", "ими", "мир", "ир "}. Частично набранное
+    или с опечаткой название делит с полным большинство триграмм.
+    """
+    trigrams = set()
+    for word in normalize_street(street).split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def split_street_and_number(text: str) -> Tuple[str, str]:
+    """
+    «Тимирязева 4 корпус 2» -> («Тимирязева», «4 корпус 2»),
+    «8 Марта, 12» -> («8 Марта», «12»), «ул. Тимирязева, д. 4» -> («ул. Тимирязева», «д. 4»).
+    Номер — последнее слово, начинающееся с цифры, если перед ним не стоит
+    «корпус», «стр.» и т.п.; стоящее перед номером «д.»/«дом» относится к номеру.
+    """
+    words = text.replace(",", " ").split()
+    start: Optional[int] = None
+    for i in range(len(words) - 1, 0, -1):
+        previous = words[i - 1].lower().rstrip(".")
+        if words[i][0].isdigit() and previous not in BUILDING_PARTS:
+            start = i
+            break
+    if start is None:
+        if len(words) < 2:
+            return text.strip(), ""
+        start = len(words) - 1
+    if start > 1 and words[start - 1].lower().rstrip(".") in HOUSE_WORDS:
+        start -= 1
+    return " ".join(words[:start]), " ".join(words[start:])
+
+
+def house_query_key(query: str) -> str:
+    """Ключ адреса из строки поиска — для кэша и склейки одинаковых запросов к 2ГИС."""
+    return address_key(*split_street_and_number(query))
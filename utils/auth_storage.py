@@ -1,30 +1,145 @@
-import logging
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from config import PARSER_STORAGE_STATE, PARSER_SESSION_COOKIES, PARSER_SESSION_WARN_DAYS
+
+
+logger = logging.getLogger(__name__)
+
+LOGIN_TIMEOUT = 600
+POLL_INTERVAL = 2
+
+NO_COOKIES_HINT = (
+    "PARSER_SESSION_COOKIES не задан: укажите через запятую имена cookie входа 2ГИС "
+    "(DevTools → Application → Cookies после входа)"
+)
+_warned_no_cookies = False
+
+
+def load_storage_state(path: str = PARSER_STORAGE_STATE) -> Optional[str]:
+    """Путь к файлу сессии для new_context или None, если входа ещё не было."""
+    if os.path.exists(path):
+        return path
+    logger.warning("Файл сессии 2ГИС %s не найден — парсер работает без авторизации", path)
+    return None
+
+
+def _session_cookies(cookies: List[dict], names: List[str]) -> List[dict]:
+    return [c for c in cookies if "2gis" in c.get("domain", "") and c["name"] in names]
 
 
-async def prepare_storage():
-    logging.basicConfig(level=logging.INFO)
+def session_expires_at(path: str = PARSER_STORAGE_STATE, names: List[str] = PARSER_SESSION_COOKIES) -> Optional[datetime]:
+    """
+    Когда истекает первая из сессионных cookie 2ГИС (None — файла нет, срок не задан
+    или не задан список cookie). По всем cookie 2ГИС не судим: короткоживущие
+    служебные cookie выдавали бы сессию за истёкшую при каждой проверке.
+    """
+    if not names or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    expires = [c["expires"] for c in _session_cookies(state.get("cookies", []), names) if c.get("expires", -1) > 0]
+    if not expires:
+        return None
+    return datetime.fromtimestamp(min(expires))
+
+
+def check_session_freshness(
+    path: str = PARSER_STORAGE_STATE,
+    warn_days: int = PARSER_SESSION_WARN_DAYS,
+) -> Optional[datetime]:
+    """Пишет предупреждение в лог, если сессия 2ГИС скоро истечёт или уже истекла."""
+    global _warned_no_cookies
+    if not PARSER_SESSION_COOKIES:
+        # Проверка вызывается при каждом пересоздании вкладки — предупреждаем один раз
+        if not _warned_no_cookies:
+            logger.warning("%s. Срок сессии не проверяется", NO_COOKIES_HINT)
+            _warned_no_cookies = True
+        return None
+    try:
+        expires_at = session_expires_at(path)
+    except (OSError, ValueError):
+        logger.exception("Не удалось прочитать файл сессии 2ГИС %s", path)
+        return None
+    if expires_at is None:
+        return None
+
+    left = expires_at - datetime.now()
+    if left <= timedelta(0):
+        logger.error("Сессия 2ГИС истекла %s. Выполните вход заново: python auth_storage.py", expires_at)
+    elif left <= timedelta(days=warn_days):
+        logger.warning(
+            "Сессия 2ГИС истекает %s (через %s ч). Обновите её: python auth_storage.py",
+            expires_at, int(left.total_seconds() // 3600)
+        )
+    return expires_at
+
+
+async def prepare_storage(
+    path: str = PARSER_STORAGE_STATE,
+    timeout: int = LOGIN_TIMEOUT,
+    names: List[str] = PARSER_SESSION_COOKIES,
+) -> None:
+    """Открывает 2ГИС для входа и сохраняет сессию, как только появились cookie names."""
+    if not names:
+        raise ValueError(NO_COOKIES_HINT)
+    from playwright.async_api import async_playwright
 
     playwright = await async_playwright().start()
-    browser = await playwright.chromium.launch_persistent_context(
-        user_data_dir="./user_data",
+    browser = await playwright.chromium.launch(
         headless=False,
         slow_mo=50,
         args=["--start-maximized"]
     )
-    page = await browser.new_page()
+    context = await browser.new_context(
+        storage_state=path if os.path.exists(path) else None,
+        no_viewport=True
+    )
+    page = await context.new_page()
 
     await page.goto("https://2gis.ru")
-    logging.info("Открылся браузер. Выполните авторизацию вручную.")
+    logger.info("Открылся браузер. Выполните авторизацию вручную.")
 
-    await asyncio.sleep(180)  # 3 минуты на авторизацию
+    # Вместо фиксированной паузы ждём появления сессионных cookie
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not page.is_closed():
+        cookies = await context.cookies()
+        if len(_session_cookies(cookies, names)) == len(names):
+            logger.info("Вход выполнен")
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+    else:
+        logger.warning("Cookie входа %s так и не появились — сессия может быть неполной", ", ".join(names))
 
-    logging.info("✅ Состояние сохранено автоматически в папке ./user_data")
+    await context.storage_state(path=path)
+    logger.info("✅ Сессия сохранена в %s", path)
 
     await browser.close()
     await playwright.stop()
 
+    check_session_freshness(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Вход в 2ГИС и сохранение сессии для парсера")
+    parser.add_argument("--path", default=PARSER_STORAGE_STATE)
+    parser.add_argument("--check", action="store_true", help="только проверить срок действия сессии")
+    args = parser.parse_args()
+
+    if not PARSER_SESSION_COOKIES:
+        parser.error(NO_COOKIES_HINT)
+    if args.check:
+        expires_at = check_session_freshness(args.path)
+        print(f"Сессия действует до {expires_at}" if expires_at else "Срок действия сессии неизвестен")
+        return
+    asyncio.run(prepare_storage(args.path))
+
 
 if __name__ == '__main__':
-    asyncio.run(prepare_storage())
+    main()
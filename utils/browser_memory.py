@@ -0,0 +1,36 @@
+import logging
+import os
+from typing import Optional
+
+try:
+    import psutil
+except ImportError:  # psutil не обязателен: без него watchdog смотрит только на JS-heap
+    psutil = None
+
+
+logger = logging.getLogger(__name__)
+
+CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def chromium_rss(pid: Optional[int] = None) -> Optional[int]:
+    """
+    Суммарный RSS процессов Chromium (браузер, рендереры, GPU), запущенных
+    из процесса pid, в байтах. None, если psutil не установлен.
+    """
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process(pid or os.getpid()).children(recursive=True)
+    except psutil.Error:
+        return None
+
+    total = 0
+    for proc in children:
+        try:
+            if any(name in proc.name().lower() for name in CHROMIUM_NAMES):
+                total += proc.memory_info().rss
+        except psutil.Error:
+            # Рендерер мог завершиться между children() и memory_info()
+            continue
+    return total
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+from playwright.async_api import Page, Response, Error as PlaywrightError
+
+
+logger = logging.getLogger(__name__)
+
+CATALOG_URL_PATTERN = "catalog.api.2gis"
+CATALOG_ITEM_PATH = "/items/byid"
+CARD_ID_RE = re.compile(r"/(?:geo|firm)/(\d+)")
+
+WEEKDAYS = [
+    ("Mon", "Пн"), ("Tue", "Вт"), ("Wed", "Ср"), ("Thu", "Чт"),
+    ("Fri", "Пт"), ("Sat", "Сб"), ("Sun", "Вс"),
+]
+
+
+def card_id_from_url(url: str) -> Optional[str]:
+    match = CARD_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+class CatalogHarvester:
+    """
+    Запоминает JSON-ответы каталога 2ГИС, которые страница загружает сама,
+    чтобы собрать карточку из них без чтения обфусцированной вёрстки.
+    """
+
+    def __init__(self, page: Page, keep: int = 20):
+        self._responses: Deque[Response] = deque(maxlen=keep)
+        self._payloads: Dict[int, Optional[dict]] = {}
+        self._arrived = asyncio.Event()
+        page.on("response", self._on_response)
+
+    def _on_response(self, response: Response) -> None:
+        url = response.url
+        if CATALOG_URL_PATTERN in url and CATALOG_ITEM_PATH in url:
+            self._responses.append(response)
+            self._arrived.set()
+
+    async def _payload(self, response: Response) -> Optional[dict]:
+        key = id(response)
+        if key not in self._payloads:
+            try:
+                self._payloads[key] = await response.json()
+            except (PlaywrightError, ValueError):
+                # Тело ответа уже недоступно (страница ушла дальше) или это не JSON
+                self._payloads[key] = None
+            alive = {id(r) for r in self._responses}
+            self._payloads = {k: v for k, v in self._payloads.items() if k in alive}
+        return self._payloads.get(key)
+
+    async def find_item(self, card_id: str) -> Optional[dict]:
+        for response in reversed(list(self._responses)):
+            payload = await self._payload(response)
+            items = ((payload or {}).get("result") or {}).get("items") or []
+            for item in items:
+                if str(item.get("id", "")).split("_")[0] == card_id:
+                    return item
+        return None
+
+    async def wait_item(self, card_id: str, timeout: float) -> Optional[dict]:
+        """Ждёт ответ каталога с нужным объектом; таймаут — верхняя граница."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            self._arrived.clear()
+            item = await self.find_item(card_id)
+            remaining = deadline - loop.time()
+            if item or remaining <= 0:
+                return item
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return await self.find_item(card_id)
+
+
+_harvesters: "WeakKeyDictionary[Page, CatalogHarvester]" = WeakKeyDictionary()
+
+
+def catalog_for(page: Page) -> CatalogHarvester:
+    """Один сборщик на вкладку, чтобы не плодить обработчики у вкладок пула."""
+    harvester = _harvesters.get(page)
+    if harvester is None:
+        harvester = _harvesters[page] = CatalogHarvester(page)
+    return harvester
+
+
+def _plural(n: int, one: str, few: str, many: str) -> str:
+    if n % 10 == 1 and n % 100 != 11:
+        return one
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return few
+    return many
+
+
+def _adm_div_names(item: dict) -> List[str]:
+    return [div["name"] for div in item.get("adm_div") or [] if div.get("name")]
+
+
+def house_from_item(item: dict) -> dict:
+    """Карточка дома в том же формате, что и DGisParser.parse_address."""
+    info = {
+        "title": item.get("address_name") or item.get("name") or "Не найдено",
+        "floors": "Не указано",
+        "entrances": "Не указано",
+        "apartments": [],
+        "address": ", ".join(_adm_div_names(item)),
+    }
+
+    floors = (item.get("floors") or {}).get("ground_count")
+    if floors:
+        info["floors"] = f"{floors} {_plural(floors, 'этаж', 'этажа', 'этажей')}"
+
+    porches = (item.get("structure_info") or {}).get("porch_count")
+    if porches:
+        info["entrances"] = f"{porches} {_plural(porches, 'подъезд', 'подъезда', 'подъездов')}"
+
+    return info
+
+
+def _format_schedule(schedule: dict) -> str:
+    if schedule.get("is_24x7"):
+        return "Круглосуточно"
+    lines = []
+    for key, label in WEEKDAYS:
+        day = schedule.get(key)
+        if not day:
+            continue
+        hours = ", ".join(
+            f"{interval.get('from', '')}–{interval.get('to', '')}"
+            for interval in day.get("working_hours") or []
+        )
+        lines.append(f"{label} {hours}".strip())
+    return "; ".join(lines)
+
+
+def _first_phone(item: dict) -> str:
+    for group in item.get("contact_groups") or []:
+        for contact in group.get("contacts") or []:
+            if contact.get("type") == "phone":
+                return contact.get("text") or contact.get("value") or ""
+    return ""
+
+
+def organization_from_item(item: dict) -> dict:
+    """Карточка организации в том же формате, что и DGisParser.parse_organization."""
+    address = item.get("address_name") or ""
+    if address and item.get("address_comment"):
+        address += f", {item['address_comment']}"
+
+    return {
+        "title": item.get("name") or "",
+        "address": address,
+        "working_hours": _format_schedule(item.get("schedule") or {}),
+        "phone": _first_phone(item),
+        "comments": ", ".join(_adm_div_names(item)),
+    }
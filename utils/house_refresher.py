@@ -0,0 +1,149 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from db.db import async_session
+from db.models import House, msk_now
+from db.crud.houses import get_stale_houses
+from db.crud.parsed_houses import apply_parsed_house_diff, extract_house_meta
+from utils.parser import refresh_house_from_2gis
+from utils.rate_limit import DGisUnavailable, DGisSelectorMiss
+from utils.scrape_queue import scrape_scheduler, ScrapeQueueFull
+from utils.zone_crawler import house_title
+from utils.address_norm import address_key
+from config import (
+    REFRESH_MAX_AGE_DAYS,
+    REFRESH_WINDOW_START,
+    REFRESH_WINDOW_END,
+    REFRESH_BATCH,
+    REFRESH_INTERVAL,
+    REFRESH_HOUSE_DELAY,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class HouseRefresher:
+    """
+    Ночное обновление домов, чьи данные старше max_age: самые востребованные
+    первыми, только в окне [window_start, window_end) и только когда очередь
+    парсинга пуста. В БД пишутся лишь изменившиеся подъезды и диапазоны квартир.
+    """
+
+    def __init__(
+        self,
+        max_age: timedelta = timedelta(days=REFRESH_MAX_AGE_DAYS),
+        window_start: int = REFRESH_WINDOW_START,
+        window_end: int = REFRESH_WINDOW_END,
+        batch: int = REFRESH_BATCH,
+        interval: float = REFRESH_INTERVAL,
+        house_delay: float = REFRESH_HOUSE_DELAY,
+    ):
+        self.max_age = max_age
+        self.window_start = window_start
+        self.window_end = window_end
+        self.batch = batch
+        self.interval = interval
+        self.house_delay = house_delay
+
+        self._task: Optional[asyncio.Task] = None
+        # Дома, которые 2ГИС не нашёл: не выбираем их снова до перезапуска бота
+        self._unresolved: Set[int] = set()
+
+        self.refreshed = 0
+        self.changed = 0
+        self.failed = 0
+        self.last_run: Optional[datetime] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def in_window(self, now: datetime) -> bool:
+        if self.window_start <= self.window_end:
+            return self.window_start <= now.hour < self.window_end
+        # Окно через полночь, например 23–5
+        return now.hour >= self.window_start or now.hour < self.window_end
+
+    def _busy(self) -> bool:
+        stats = scrape_scheduler.stats()
+        return stats["queued"] > 0 or stats["running"] > 0
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.in_window(msk_now()) or self._busy():
+                continue
+            try:
+                await self.refresh_batch()
+            except Exception:
+                logger.exception("Ошибка обновления устаревших домов")
+
+    async def refresh_batch(self) -> None:
+        older_than = (msk_now() - self.max_age).replace(tzinfo=None)
+        async with async_session() as session:
+            houses = await get_stale_houses(session, older_than, self.batch, list(self._unresolved))
+        if not houses:
+            return
+
+        self.last_run = msk_now()
+        logger.info("Обновляем %s устаревших домов", len(houses))
+        for house in houses:
+            # Пиковая нагрузка важнее: уступаем, как только появились живые запросы
+            if not self.in_window(msk_now()) or self._busy():
+                return
+            try:
+                await self.refresh_house(house)
+            except (DGisUnavailable, DGisSelectorMiss, ScrapeQueueFull):
+                # Сбой 2ГИС, а не данных дома: продолжим в следующий запуск
+                return
+            except Exception:
+                self.failed += 1
+                self._unresolved.add(house.id)
+                logger.warning("Не удалось обновить дом %s", house.id, exc_info=True)
+            await asyncio.sleep(self.house_delay)
+
+    async def refresh_house(self, house: House) -> None:
+        if not house.zone or not house.zone.city:
+            self._unresolved.add(house.id)
+            return
+        info = await refresh_house_from_2gis(house.zone.city.url, f"{house.street} {house.house_number}")
+        if info is None:
+            self.failed += 1
+            self._unresolved.add(house.id)
+            return
+
+        parsed = dict(info, title=house_title(info))
+        street, house_number, *_ = extract_house_meta(parsed)
+        # Поиск мог вернуть соседний дом — такие данные не применяем
+        if address_key(street, house_number) != address_key(house.street, house.house_number):
+            self.failed += 1
+            self._unresolved.add(house.id)
+            logger.info("2ГИС вернул другой дом для %s %s: %s", house.street, house.house_number, info.get("title"))
+            return
+
+        async with async_session() as session:
+            changed = await apply_parsed_house_diff(session, house.id, parsed, house.updated_by)
+        self.refreshed += 1
+        if changed:
+            self.changed += 1
+            logger.info("Дом %s %s обновлён из 2ГИС", house.street, house.house_number)
+
+    def stats(self) -> dict:
+        return {
+            "refreshed": self.refreshed,
+            "changed": self.changed,
+            "failed": self.failed,
+            "last_run": self.last_run,
+        }
+
+
+house_refresher = HouseRefresher()
@@ -154,3 +154,88 @@ def build_house_address_info(
 
     return text
 
+
+def build_pool_stats_message(pool: dict) -> str:
+    recycle_reasons = ", ".join(f"{reason} {count}" for reason, count in pool["recycle_reasons"].items())
+    if recycle_reasons:
+        recycle_reasons = f" ({recycle_reasons})"
+    memory = f"JS-heap {pool['heap_mb']:.0f} МБ"
+    if pool["rss_mb"] is not None:
+        memory = f"RSS {pool['rss_mb']:.0f} МБ, {memory}"
+    return (
+        f"🧭 <b>Вкладки:</b> {pool['idle']}/{pool['size']} свободно, "
+        f"пересоздано {pool['recycled']}{recycle_reasons}\n"
+        f"🧠 <b>Память браузера:</b> {memory}, перезапусков {pool['browser_restarts']}\n"
+        f"🔑 <b>Сессия 2ГИС до:</b> "
+        f"{pool['session_expires_at'].strftime('%d.%m.%Y %H:%M') if pool['session_expires_at'] else '—'}\n"
+        f"🚫 <b>Отброшено запросов:</b> {pool['requests']['blocked']} "
+        f"из {pool['requests']['blocked'] + pool['requests']['allowed']}, "
+        f"сэкономлено ~{pool['requests']['bytes_saved'] / 1024 / 1024:.1f} МБ (оценка)\n\n"
+    )
+
+
+def build_scrape_stats_message(
+    queue: dict, pool: dict | None, cache: dict, flights: dict, jobs: dict, workers: dict,
+    breaker: dict, limiter: dict, refresher: dict
+) -> str:
+    """pool — None, когда браузеры работают в процессах парсера: пул бота тогда не используется."""
+    breaker_state = {"closed": "🟢 работает", "half_open": "🟡 пробный запрос", "open": "🔴 недоступен"}[breaker["state"]]
+    if breaker["state"] == "open":
+        breaker_state += f", повтор через {breaker['retry_after']:.0f} с"
+    text = (
+        "📊 <b>Парсер 2ГИС</b>\n\n"
+        f"🔌 <b>2ГИС:</b> {breaker_state}\n"
+        f"⚡️ <b>Сбоев подряд:</b> {breaker['failures']}, размыканий {breaker['trips']}, "
+        f"отклонено {breaker['rejected']}\n"
+        f"🚥 <b>Частота переходов:</b> {limiter['rate']:.2f}/{limiter['max_rate']:.2f} в секунду\n\n"
+        f"⚙️ <b>Лимиты:</b> {queue['concurrency']} одновременно, "
+        f"очередь до {queue['max_depth']}, до {queue['max_per_user']} на пользователя\n"
+        f"▶️ <b>Выполняется:</b> {queue['running']}\n"
+        f"⏳ <b>В очереди:</b> {queue['queued']} (пользователей: {queue['users']})\n"
+        f"⏱ <b>Среднее время:</b> {queue['avg_duration']:.1f} с\n"
+        f"✅ <b>Готово:</b> {queue['completed']}  "
+        f"❌ <b>Ошибок:</b> {queue['failed']}  "
+        f"🚦 <b>Отклонено:</b> {queue['rejected']}\n\n"
+        + (build_pool_stats_message(pool) if pool is not None else "")
+        + f"🗄 <b>Кэш:</b> {cache['memory_hits']} из памяти, {cache['db_hits']} из БД, "
+        f"{cache['misses']} промахов (в памяти {cache['lru']})\n"
+        f"🔗 <b>Склеено одинаковых запросов:</b> {flights['coalesced']} "
+        f"(сейчас выполняется {flights['inflight']})\n"
+        f"📨 <b>Фоновые задачи:</b> {jobs['active']} активно, {jobs['succeeded']} готово, "
+        f"{jobs['failed']} ошибок, {jobs['timed_out']} по таймауту\n"
+        f"🔄 <b>Обновление домов:</b> {refresher['refreshed']} проверено, {refresher['changed']} изменено, "
+        f"{refresher['failed']} не найдено (последний запуск "
+        f"{refresher['last_run'].strftime('%d.%m %H:%M') if refresher['last_run'] else '—'})"
+    )
+    if workers["size"]:
+        text += (
+            f"\n🧩 <b>Процессы парсера:</b> {workers['alive']}/{workers['size']} живы, "
+            f"{workers['idle']} свободно, перезапусков {workers['restarts']}"
+        )
+    return text
+
+
+def build_parser_stages_message(rows: list, lookups: int, limit: int = 15) -> str:
+    text = f"⏱ <b>Этапы парсера</b> (поисков: {lookups})\n\n"
+    if not rows:
+        return text + "Замеров пока нет."
+    lines = [
+        f"<b>{r['stage']}</b> · {r['entry']} · {r['city']}"
+        + (f" · {r['outcome']}" if r["outcome"] != "hit" else "")
+        + f": p95 {r['p95']:.2f} с, ср. {r['avg']:.2f} с, макс. {r['max']:.2f} с ({r['count']})"
+        for r in rows[:limit]
+    ]
+    return text + "\n".join(lines)
+
+
+def build_crawl_progress_message(zone_name: str, job, page_no: int, finished: bool = False) -> str:
+    header = "✅ <b>Обход района завершён</b>" if finished else "🕷 <b>Обход района в 2ГИС</b>"
+    return (
+        f"{header}\n\n"
+        f"🗺 <b>Район:</b> {zone_name}\n"
+        f"📄 <b>Страниц выдачи:</b> {page_no}\n"
+        f"🏠 <b>Найдено домов:</b> {job.found}\n"
+        f"➕ <b>Добавлено:</b> {job.saved}\n"
+        f"⏭ <b>Пропущено:</b> {job.skipped}\n"
+        f"❌ <b>Ошибок:</b> {job.failed}"
+    )
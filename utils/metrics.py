@@ -0,0 +1,168 @@
+import contextvars
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+logger = logging.getLogger(__name__)
+
+# (этап, длительность в секундах, исход)
+StageRecord = Tuple[str, float, str]
+
+
+class StageTimer:
+    """Изменяемый исход этапа: код внутри with может выставить "timeout", "fallback" и т.п."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.outcome = "hit"
+
+
+class LookupTrace:
+    """Этапы одного поиска в 2ГИС: точка входа, город и время каждого шага."""
+
+    def __init__(self, entry: str, city: str = ""):
+        self.entry = entry
+        self.city = city
+        self.stages: List[StageRecord] = []
+        self.started = time.perf_counter()
+
+    def summary(self) -> str:
+        # Одинаковые этапы (например, несколько переходов) складываем
+        totals: Dict[str, float] = {}
+        outcomes: Dict[str, str] = {}
+        for name, duration, outcome in self.stages:
+            totals[name] = totals.get(name, 0.0) + duration
+            if outcome != "hit":
+                outcomes[name] = outcome
+        parts = [
+            f"{name} {total:.2f}" + (f" ({outcomes[name]})" if name in outcomes else "")
+            for name, total in totals.items()
+        ]
+        return ", ".join(parts)
+
+
+_current_trace: contextvars.ContextVar[Optional[LookupTrace]] = contextvars.ContextVar("lookup_trace", default=None)
+
+
+class StageStats:
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class ParserMetrics:
+    """Сводка по этапам парсера в процессе бота: (точка входа, город, этап, исход) -> время."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._stats: Dict[Tuple[str, str, str, str], StageStats] = {}
+        self.lookups = 0
+
+    def record(self, entry: str, city: str, name: str, duration: float, outcome: str) -> None:
+        key = (entry, city, name, outcome)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = StageStats(self.window)
+        stats.add(duration)
+
+    def snapshot(self) -> List[dict]:
+        rows = [
+            {
+                "entry": entry,
+                "city": city,
+                "stage": name,
+                "outcome": outcome,
+                "count": stats.count,
+                "avg": stats.total / stats.count,
+                "p95": stats.percentile(0.95),
+                "max": stats.max,
+            }
+            for (entry, city, name, outcome), stats in self._stats.items()
+        ]
+        return sorted(rows, key=lambda r: r["p95"], reverse=True)
+
+
+parser_metrics = ParserMetrics()
+
+
+def record_stage(name: str, duration: float, outcome: str = "hit") -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.stages.append((name, duration, outcome))
+    if trace is None:
+        parser_metrics.record("-", "-", name, duration, outcome)
+    else:
+        parser_metrics.record(trace.entry, trace.city or "-", name, duration, outcome)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageTimer]:
+    """Замеряет этап; таймаут Playwright и прочие ошибки попадают в исход."""
+    timer = StageTimer(name)
+    started = time.perf_counter()
+    try:
+        yield timer
+    except PlaywrightTimeoutError:
+        timer.outcome = "timeout"
+        raise
+    except Exception:
+        timer.outcome = "error"
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - started, timer.outcome)
+
+
+@contextmanager
+def lookup_trace(entry: str, city: str = "") -> Iterator[LookupTrace]:
+    """Собирает этапы одного поиска и пишет их сводку одной строкой в лог."""
+    trace = LookupTrace(entry, city)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        parser_metrics.lookups += 1
+        logger.info(
+            "2ГИС %s %s: %.2f с [%s]",
+            entry, city or "-", time.perf_counter() - trace.started, trace.summary()
+        )
+
+
+def merge_stages(stages: List[StageRecord]) -> None:
+    """
+    Этапы, замеренные в процессе-воркере, добавляются в текущий поиск и сводку бота —
+    с точкой входа и городом этого поиска.
+    """
+    for name, duration, outcome in stages:
+        record_stage(name, duration, outcome)
+
+
+@contextmanager
+def collect_stages() -> Iterator[LookupTrace]:
+    """Как lookup_trace, но без записи в лог: для процессов-воркеров, отдающих этапы боту."""
+    trace = LookupTrace("worker")
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
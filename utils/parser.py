@@ -1,8 +1,155 @@
 import logging
 import asyncio
+import time
 from typing import Tuple, List, Optional
+from urllib.parse import quote, urlparse
 from pprint import pprint as pp
-from playwright.async_api import async_playwright, Page, BrowserContext, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import (
+    async_playwright, Browser, Page, BrowserContext,
+    Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+)
+
+from utils.parser_pool import parser_pool
+from utils.request_filter import request_filter
+from utils.dgis_catalog import catalog_for, card_id_from_url, house_from_item, organization_from_item
+from utils.auth_storage import load_storage_state
+from utils.snapshots import snapshot_archive
+from utils.metrics import stage, lookup_trace
+from config import (
+    PARSER_EXTRACTION_MODE, PARSER_CANDIDATE_TABS, PARSER_STORAGE_STATE, PARSER_SNAPSHOTS, PARSER_GOTO_BUDGET
+)
+from utils.scrape_queue import scrape_scheduler, QueuedCallback, StartedCallback
+from utils.scrape_cache import scrape_cache, scrape_key
+from utils.address_norm import house_query_key
+from utils.singleflight import scrape_flights
+from utils.parser_workers import parser_workers
+from utils.rate_limit import dgis_limiter, dgis_breaker, retry, DGisSelectorMiss
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_SELECTOR = "div._awwm2v"
+CARD_SELECTOR = "div._49kxlr"
+
+# Верхние границы ожидания (мс): это таймауты, а не паузы
+SEARCH_OUTCOME_TIMEOUT = 8000
+NAVIGATION_TIMEOUT = 30000
+CARD_TIMEOUT = 15000
+TITLE_TIMEOUT = 3000
+CATALOG_TIMEOUT = 3000
+
+TITLE_SELECTOR = "h1._1x89xo5 span"
+SEARCH_BLOCK_SELECTOR = "div._awwm2v div._1kf6gff"
+
+# Типы организаций, подходящие под ЖЭУ, в порядке предпочтения
+HOUSING_OFFICE_KEYWORDS = ["жэу", "жэк", "управляющая компания", "жилищно-коммунальные", "тсж", "дэз", "эксплуатация"]
+
+# Извлечение данных целиком внутри страницы: один вызов вместо
+# отдельного round trip на каждое поле и каждый элемент списка.
+SEARCH_RESULTS_JS = """
+blocks => blocks.map(block => {
+    const link = block.querySelector("a._1rehek");
+    const type = block.querySelector("div._1idnaau span._oqoid");
+    return {
+        title: link ? link.textContent : "",
+        type: type ? type.textContent : "",
+        href: link ? link.getAttribute("href") : "",
+    };
+})
+"""
+
+# Что показала выдача: карточку, список или «ничего не найдено». null — ещё грузится
+SEARCH_OUTCOME_JS = """
+([card, results, markers]) => {
+    if (document.querySelector(card)) return "card";
+    if (document.querySelector(results)) return "results";
+    const text = document.body ? document.body.innerText.toLowerCase() : "";
+    return markers.some(marker => text.includes(marker)) ? "empty" : null;
+}
+"""
+
+# Тексты 2ГИС при пустой выдаче
+EMPTY_RESULTS_MARKERS = ["ничего не нашлось", "ничего не найдено", "точных совпадений нет"]
+
+HOUSE_CARD_JS = """
+() => {
+    const visible = el => !!el && el.getClientRects().length > 0;
+    const title = document.querySelector("h1._1x89xo5 span");
+    const entrances = document.querySelector("div._ksc2xc");
+    const toggle = document.querySelector("div._z3fqkm");
+    const arrow = toggle && toggle.querySelector("svg");
+    return {
+        title: visible(title) ? title.textContent : "",
+        address_parts: Array.from(document.querySelectorAll("div._1idnaau span._sfdp8cg"), e => e.textContent),
+        floors_blocks: Array.from(document.querySelectorAll("div._49kxlr span._wrdavn"), e => e.textContent),
+        entrances: visible(entrances) ? entrances.textContent : "",
+        collapsed: visible(toggle) && !!arrow && (arrow.getAttribute("style") || "").includes("rotate(0deg)"),
+    };
+}
+"""
+
+APARTMENTS_COLLAPSED_JS = """
+() => {
+    const toggle = document.querySelector("div._z3fqkm");
+    const arrow = toggle && toggle.querySelector("svg");
+    return toggle && toggle.getClientRects().length > 0
+        && !!arrow && (arrow.getAttribute("style") || "").includes("rotate(0deg)");
+}
+"""
+
+ORG_HEADER_JS = """
+() => {
+    const visible = el => !!el && el.getClientRects().length > 0;
+    const title = document.querySelector("h1._1x89xo5 span");
+    const addrMain = document.querySelector("span._14quei a._2lcm958");
+    const addrSpans = document.querySelectorAll("span._14quei span._wrdavn");
+    const cards = Array.from(document.querySelectorAll("div._49kxlr"));
+    return {
+        title: visible(title) ? title.textContent : "",
+        address_main: visible(addrMain) ? addrMain.textContent : "",
+        address_extra: addrSpans.length > 1 ? addrSpans[1].textContent : "",
+        schedule_index: cards.findIndex(card => card.querySelector("div._ksc2xc, div._3cx6m8")),
+    };
+}
+"""
+
+SLIDER_STATES_JS = """
+sliders => sliders.map(slider => {
+    const arrow = slider.querySelector("svg");
+    return !!arrow && (arrow.getAttribute("style") || "").includes("rotate(0deg)");
+})
+"""
+
+SCHEDULE_JS = """
+card => {
+    const visible = el => !!el && el.getClientRects().length > 0;
+    const expanded = card.querySelector("div._1ovqm446");
+    if (visible(expanded)) {
+        const rows = Array.from(expanded.querySelectorAll("div._3cx6m8 div._bt4zwr"), row => {
+            const day = row.querySelector("div._6odjfl");
+            return {
+                day: day ? day.textContent : "",
+                times: Array.from(row.querySelectorAll("div._1jh072e bdo, div._hc7qlf"), t => t.textContent),
+            };
+        });
+        return {rows: rows, closed: ""};
+    }
+    const closed = card.querySelector("div._ksc2xc");
+    return {rows: null, closed: visible(closed) ? closed.innerText : ""};
+}
+"""
+
+ORG_CONTACTS_JS = """
+() => {
+    const visible = el => !!el && el.getClientRects().length > 0;
+    const phone = document.querySelector("a[href^='tel:']");
+    const comments = document.querySelector("div._1p8iqzw");
+    return {
+        phone: visible(phone) ? phone.textContent : "",
+        comments: visible(comments) ? comments.textContent : "",
+    };
+}
+"""
 
 
 def clean_text(text: str) -> str:
@@ -13,78 +160,236 @@ def clean_text(text: str) -> str:
     )
 
 
+def search_url(city_url: str, query: str, page_no: int = 1) -> str:
+    """https://2gis.ru/kazan + "Тимирязева 4" -> https://2gis.ru/kazan/search/Тимирязева%204"""
+    url = f"{city_url.rstrip('/')}/search/{quote(query.strip(), safe='')}"
+    return f"{url}/page/{page_no}" if page_no > 1 else url
+
+
 class DGisParser:
-    def __init__(self, headless: bool = True):
+    def __init__(
+        self,
+        headless: bool = True,
+        page: Optional[Page] = None,
+        extraction_mode: str = PARSER_EXTRACTION_MODE,
+        snapshots: bool = PARSER_SNAPSHOTS,
+        throttled: bool = True
+    ):
+        # Если передана страница (например, из пула), start()/stop() не нужны
         self.playwright = None
-        self.browser: Optional[BrowserContext] = None
-        self.page: Optional[Page] = None
-        self.user_data_dir = "./user_data"
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = page
+        self.catalog = catalog_for(page) if page else None
+        self.storage_state = PARSER_STORAGE_STATE
         self.headless = headless
+        # "api" — собирать карточку из JSON каталога, "dom" — только из вёрстки
+        self.extraction_mode = extraction_mode
+        # Сохранять ли сырые карточки в архив снимков
+        self.snapshots = snapshots
+        # Ограничение частоты и повторы переходов; при воспроизведении из HAR они только искажают замеры
+        self.throttled = throttled
+        self.card_timeout = CARD_TIMEOUT
 
     async def start(self):
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch_persistent_context(
-            user_data_dir=self.user_data_dir,
-            headless=self.headless,
-            slow_mo=50,
-            args=[]
-        )
-        self.page = await self.browser.new_page()
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
-        await self.page.goto("https://2gis.ru")
+        with stage("browser_start"):
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless,
+                slow_mo=50,
+                args=[]
+            )
+            self.context = await self.browser.new_context(
+                storage_state=load_storage_state(self.storage_state),
+                viewport={"width": 1920, "height": 1080},
+            )
+            await request_filter.install(self.context)
+            self.page = await self.context.new_page()
+            self.catalog = catalog_for(self.page)
+            await self.page.goto("https://2gis.ru")
 
     async def stop(self):
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        with stage("teardown"):
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+
+    async def _goto(self, url: str, **kwargs):
+        """
+        Переход с ограничением частоты и повторами при сетевых сбоях.
+        Таймаут не повторяем: страница и так ждала полный срок. Все попытки
+        вместе укладываются в PARSER_GOTO_BUDGET секунд.
+        """
+        if not self.throttled:
+            with stage("goto"):
+                return await self.page.goto(url, **kwargs)
+
+        deadline = time.monotonic() + PARSER_GOTO_BUDGET
+        timeout = kwargs.pop("timeout", NAVIGATION_TIMEOUT)
+
+        async def navigate():
+            await dgis_limiter.acquire()
+            remaining = (deadline - time.monotonic()) * 1000
+            if remaining <= 0:
+                raise PlaywrightTimeoutError(f"Бюджет перехода на {url} исчерпан")
+            return await self.page.goto(url, timeout=min(timeout, remaining), **kwargs)
+
+        with stage("goto"):
+            response = await retry(
+                navigate, (PlaywrightError,),
+                no_retry_on=(PlaywrightTimeoutError,),
+                deadline=deadline,
+                on_retry=lambda e: dgis_limiter.slow_down()
+            )
+        # 429 и 5xx — 2ГИС просит притормозить
+        if response is not None and (response.status == 429 or response.status >= 500):
+            dgis_limiter.slow_down()
+        else:
+            dgis_limiter.speed_up()
+        return response
 
     async def is_card_opened(self) -> bool:
         try:
-            await self.page.wait_for_selector("div._49kxlr", timeout=5000)
+            await self.page.wait_for_selector(CARD_SELECTOR, timeout=5000)
             return True
         except PlaywrightTimeoutError:
             return False
 
-    async def search_addresses(self, query: str, city_url: str) -> Tuple[List[dict], bool]:
-        await self.page.goto(city_url)
-
-        await self.page.wait_for_selector("input[placeholder='Поиск в 2ГИС']", timeout=10000)
-        await self.page.fill("input[placeholder='Поиск в 2ГИС']", query)
-        await self.page.keyboard.press("Enter")
-        await self.page.wait_for_timeout(3000)
-
-        if await self.is_card_opened():
+    async def wait_card_ready(self) -> None:
+        """
+        Ждёт карточку, а затем её заголовок — признак, что данные отрисованы.
+        Бросает DGisSelectorMiss, если карточка так и не появилась.
+        """
+        try:
+            with stage("card_ready") as st:
+                await self.page.wait_for_selector(CARD_SELECTOR, timeout=self.card_timeout)
+                try:
+                    await self.page.wait_for_selector(TITLE_SELECTOR, timeout=TITLE_TIMEOUT)
+                except PlaywrightTimeoutError:
+                    st.outcome = "no_title"
+        except PlaywrightTimeoutError:
+            # Пустая карточка — сбой страницы, а не ответ: он не должен попасть в кэш
+            raise DGisSelectorMiss(f"Карточка 2ГИС не загрузилась: {self.page.url}") from None
+
+    async def wait_search_outcome(self, timeout: int = SEARCH_OUTCOME_TIMEOUT) -> Optional[str]:
+        """
+        Ждёт, что появится первым после поиска: список результатов, сразу
+        открытая карточка или сообщение о пустой выдаче.
+        Возвращает "card", "results", "empty" или None.
+        """
+        with stage("search_outcome") as st:
+            try:
+                handle = await self.page.wait_for_function(
+                    SEARCH_OUTCOME_JS,
+                    arg=[CARD_SELECTOR, RESULTS_SELECTOR, EMPTY_RESULTS_MARKERS],
+                    timeout=timeout,
+                    polling=250,
+                )
+            except PlaywrightTimeoutError:
+                st.outcome = "timeout"
+                return None
+            outcome = await handle.json_value()
+            if outcome != "results":
+                st.outcome = outcome
+            return outcome
+
+    async def submit_search(self, query: str, city_url: str, page_no: int = 1) -> str:
+        """
+        Открывает выдачу и возвращает "card", "results" или "empty" (2ГИС ничего
+        не нашёл). Бросает DGisSelectorMiss, если страница не показала ничего из этого.
+        """
+        # Сразу открываем выдачу по URL: без загрузки главной и ввода в поле поиска
+        await self._goto(search_url(city_url, query, page_no), wait_until="domcontentloaded")
+        outcome = await self.wait_search_outcome()
+        if outcome is None:
+            raise DGisSelectorMiss(f"Нет ни выдачи, ни карточки для запроса «{query}»")
+        return outcome
+
+    async def extract_search_results(self) -> List[dict]:
+        """Заголовок, тип и ссылка всех результатов поиска за один вызов."""
+        with stage("search_results"):
+            return await self.page.eval_on_selector_all(SEARCH_BLOCK_SELECTOR, SEARCH_RESULTS_JS)
+
+    async def search_addresses(self, query: str, city_url: str, page_no: int = 1) -> Tuple[List[dict], bool]:
+        outcome = await self.submit_search(query, city_url, page_no)
+
+        if outcome == "card":
             return [], True
+        if outcome == "empty":
+            return [], False
 
         results = []
-        try:
-            await self.page.wait_for_selector("div._awwm2v", timeout=5000)
-            blocks = self.page.locator("div._awwm2v div._1kf6gff")
-            count = await blocks.count()
-
-            for i in range(count):
-                title = await blocks.nth(i).locator("a._1rehek").first.text_content()
-                type_ = await blocks.nth(i).locator("div._1idnaau span._oqoid").first.text_content()
-                href = await blocks.nth(i).locator("a._1rehek").first.get_attribute("href")
-
-                if title and type_ and href:
-                    type_ = type_.lower()
-                    if any(word in type_ for word in ["жилой дом", "многоквартирный дом", "дом"]):
-                        results.append({
-                            "title": clean_text(title),
-                            "url": f"https://2gis.ru{href.strip()}"
-                        })
-            return results, False
+        for block in await self.extract_search_results():
+            title, type_, href = block["title"], block["type"], block["href"]
+            if title and type_ and href:
+                type_ = type_.lower()
+                if any(word in type_ for word in ["жилой дом", "многоквартирный дом", "дом"]):
+                    results.append({
+                        "title": clean_text(title),
+                        "url": f"https://2gis.ru{href.strip()}"
+                    })
+        return results, False
+
+    async def catalog_item(self) -> Optional[dict]:
+        """Объект каталога для открытой карточки или None, если ответ не пойман."""
+        if self.extraction_mode != "api":
+            return None
+        card_id = card_id_from_url(self.page.url)
+        if not card_id:
+            return None
+        with stage("catalog") as st:
+            item = await self.catalog.wait_item(card_id, timeout=CATALOG_TIMEOUT / 1000)
+            if item is None:
+                # Ответ каталога не пойман — дальше данные берутся из вёрстки
+                st.outcome = "fallback"
+            return item
+
+    async def read_apartments(self, collapsed: Optional[bool] = None) -> List[str]:
+        """Раскрывает список подъездов, если он свёрнут, и читает квартиры."""
+        with stage("apartments") as st:
+            if collapsed is None:
+                collapsed = await self.page.evaluate(APARTMENTS_COLLAPSED_JS)
+            if collapsed:
+                try:
+                    await self.page.locator('div._z3fqkm').first.click()
+                    await self.page.wait_for_selector('div._1ovqm446', timeout=5000)
+                    await self.page.wait_for_selector('div._1y6lfljs', timeout=2000)
+                except Exception:
+                    st.outcome = "timeout"
 
-        except PlaywrightTimeoutError:
-            return [], False
+            apartments = await self.page.locator("div._1y6lfljs").all_text_contents()
+            return [clean_text(apt) for apt in apartments if apt]
+
+    async def save_snapshot(self, kind: str, item: Optional[dict]) -> Optional[str]:
+        """Кладёт HTML карточки и JSON каталога в архив; возвращает sha или None."""
+        try:
+            with stage("snapshot"):
+                snapshot = {"kind": kind, "url": self.page.url, "item": item, "html": await self.page.content()}
+                return await asyncio.to_thread(snapshot_archive.save, snapshot)
+        except Exception:
+            logger.exception("Не удалось сохранить снимок карточки 2ГИС")
+            return None
 
     async def parse_address(self, url: str = None) -> dict:
         if url:
-            await self.page.goto(url)
+            await self._goto(url)
+
+        item = await self.catalog_item()
+        info = await self.extract_address(item)
+        # Снимок после извлечения: в нём уже раскрыты списки подъездов
+        if self.snapshots:
+            info["snapshot_sha"] = await self.save_snapshot("house", item)
+        return info
 
-        await self.page.wait_for_timeout(2000)
+    async def extract_address(self, item: Optional[dict] = None) -> dict:
+        """Данные дома с уже открытой карточки (или из снимка, см. reextract.py)."""
+        if item:
+            info = house_from_item(item)
+            # Квартиры по подъездам в ответе каталога не приходят — берём из карточки
+            await self.wait_card_ready()
+            info["apartments"] = await self.read_apartments()
+            return info
 
         info = {
             "title": "Не найдено",
@@ -94,55 +399,39 @@ class DGisParser:
             "address": ""
         }
 
-        try:
-            await self.page.wait_for_selector("div._49kxlr", timeout=15000)
-
-            title_elem = self.page.locator("h1._1x89xo5 span").first
-            if await title_elem.is_visible():
-                info["title"] = clean_text(await title_elem.text_content())
+        await self.wait_card_ready()
 
-            addr_parts = await self.page.locator("div._1idnaau span._sfdp8cg").all_text_contents()
-            if addr_parts:
-                info["address"] = clean_text(', '.join(addr_parts))
+        with stage("house_card"):
+            card = await self.page.evaluate(HOUSE_CARD_JS)
+        if card["title"]:
+            info["title"] = clean_text(card["title"])
 
-            floors_blocks = await self.page.locator("div._49kxlr span._wrdavn").all_text_contents()
-            for block in floors_blocks:
-                if "этаж" in block:
-                    info["floors"] = clean_text(block)
+        if card["address_parts"]:
+            info["address"] = clean_text(', '.join(card["address_parts"]))
 
-            entrances_elem = self.page.locator("div._ksc2xc").first
-            if await entrances_elem.is_visible():
-                entrances_text = await entrances_elem.text_content()
-                if entrances_text and "подъезд" in entrances_text:
-                    info["entrances"] = clean_text(entrances_text)
+        for block in card["floors_blocks"]:
+            if "этаж" in block:
+                info["floors"] = clean_text(block)
 
-            try:
-                toggle = self.page.locator('div._z3fqkm')
-                if await toggle.is_visible():
-                    arrow = await toggle.locator('svg').get_attribute('style') or ""
-                    if 'rotate(0deg)' in arrow:
-                        await toggle.click()
-                        await self.page.wait_for_selector('div._1ovqm446', timeout=5000)
-                        await self.page.wait_for_timeout(1000)
-            except Exception:
-                pass
-
-            apartments = self.page.locator("div._1y6lfljs")
-            count = await apartments.count()
-            for i in range(count):
-                apt = await apartments.nth(i).text_content()
-                if apt:
-                    info["apartments"].append(clean_text(apt))
-
-        except PlaywrightTimeoutError:
-            pass
+        if "подъезд" in card["entrances"]:
+            info["entrances"] = clean_text(card["entrances"])
 
+        info["apartments"] = await self.read_apartments(card["collapsed"])
         return info
 
     async def parse_organization(self, url: str = None) -> dict:
         if url:
-            await self.page.goto(url)
-        await self.page.wait_for_timeout(2000)
+            await self._goto(url)
+
+        item = await self.catalog_item()
+        info = await self.extract_organization(item)
+        if self.snapshots:
+            info["snapshot_sha"] = await self.save_snapshot("organization", item)
+        return info
+
+    async def extract_organization(self, item: Optional[dict] = None) -> dict:
+        if item:
+            return organization_from_item(item)
 
         info = {
             "title": "",
@@ -152,155 +441,266 @@ class DGisParser:
             "comments": ""
         }
 
-        try:
-            await self.page.wait_for_selector("div._49kxlr", timeout=15000)
-
-            title_elem = self.page.locator("h1._1x89xo5 span").first
-            if await title_elem.is_visible():
-                info["title"] = clean_text(await title_elem.text_content())
-
-            addr_main = ""
-            addr_extra = ""
-            addr_a = self.page.locator("span._14quei a._2lcm958").first
-            if await addr_a.is_visible():
-                addr_main = clean_text(await addr_a.text_content())
-            addr_spans = self.page.locator("span._14quei span._wrdavn")
-            if await addr_spans.count() > 1:
-                addr_extra = clean_text(await addr_spans.nth(1).text_content())
-            if addr_main:
-                info["address"] = addr_main
-                if addr_extra:
-                    info["address"] += f", {addr_extra}"
-
-            cards = self.page.locator("div._49kxlr")
-            card_count = await cards.count()
-            schedule_card = None
-            for i in range(card_count):
-                card = cards.nth(i)
-                if await card.locator("div._ksc2xc, div._3cx6m8").count() > 0:
-                    schedule_card = card
-                    break
-            if not schedule_card:
-                print("❗ Не найдена карточка с расписанием")
-                return info
-
-            sliders = schedule_card.locator('div._z3fqkm')
-            slider_count = await sliders.count()
-            for i in range(slider_count):
-                slider = sliders.nth(i)
-                await slider.scroll_into_view_if_needed()
-                await self.page.wait_for_timeout(100)
-                arrow = await slider.locator('svg').get_attribute('style') or ""
-                if 'rotate(0deg)' in arrow:
-                    await slider.click(force=True)
-                    await self.page.wait_for_timeout(200)
-
-            ovqm = schedule_card.locator("div._1ovqm446").first
-            if await ovqm.is_visible():
-                try:
-                    await ovqm.wait_for_selector("div._3cx6m8", timeout=2000)
-                except Exception:
-                    pass
-                wh_table = ovqm.locator("div._3cx6m8")
-                bt_blocks = wh_table.locator("div._bt4zwr")
-                bt_count = await bt_blocks.count()
-                wh_lines = []
-                for i in range(bt_count):
-                    day = await bt_blocks.nth(i).locator("div._6odjfl").first.text_content()
-                    time = await bt_blocks.nth(i).locator("div._1jh072e bdo, div._hc7qlf").all_text_contents()
-                    time_str = ", ".join([clean_text(t) for t in time if t.strip()])
-                    wh_lines.append(f"{clean_text(day)} {time_str}".strip())
-                info["working_hours"] = "; ".join(wh_lines)
-            else:
-                try:
-                    closed_block = schedule_card.locator("div._ksc2xc").first
-                    if await closed_block.is_visible():
-                        closed_text = await closed_block.inner_text()
-                        if closed_text:
-                            info["working_hours"] = clean_text(closed_text)
-                except Exception:
-                    info["working_hours"] = ""
-
+        await self.wait_card_ready()
+
+        with stage("org_header"):
+            header = await self.page.evaluate(ORG_HEADER_JS)
+        if header["title"]:
+            info["title"] = clean_text(header["title"])
+
+        addr_main = clean_text(header["address_main"])
+        addr_extra = clean_text(header["address_extra"])
+        if addr_main:
+            info["address"] = addr_main
+            if addr_extra:
+                info["address"] += f", {addr_extra}"
+
+        if header["schedule_index"] < 0:
+            logger.warning("Не найдена карточка с расписанием: %s", self.page.url)
+            return info
+        schedule_card = self.page.locator(CARD_SELECTOR).nth(header["schedule_index"])
+
+        sliders = schedule_card.locator('div._z3fqkm')
+        with stage("sliders") as st:
+            collapsed = await sliders.evaluate_all(SLIDER_STATES_JS)
+            for i, is_collapsed in enumerate(collapsed):
+                if is_collapsed:
+                    slider = sliders.nth(i)
+                    # Нераскрытый блок — неполное расписание, а не сбой карточки
+                    try:
+                        await slider.scroll_into_view_if_needed()
+                        await slider.click(force=True)
+                        # Ждём раскрытия блока, а не фиксированную паузу
+                        await schedule_card.locator("div._1ovqm446").first.wait_for(state="visible", timeout=1000)
+                    except PlaywrightTimeoutError:
+                        st.outcome = "timeout"
+
+        with stage("schedule"):
+            schedule = await schedule_card.evaluate(SCHEDULE_JS)
+        if schedule["rows"] is not None:
+            wh_lines = []
+            for row in schedule["rows"]:
+                time_str = ", ".join([clean_text(t) for t in row["times"] if t.strip()])
+                wh_lines.append(f"{clean_text(row['day'])} {time_str}".strip())
+            info["working_hours"] = "; ".join(wh_lines)
+        elif schedule["closed"]:
+            info["working_hours"] = clean_text(schedule["closed"])
+
+        with stage("contacts") as st:
             show_phone_btn = self.page.locator("button._1tkj2hw").first
             if await show_phone_btn.is_visible():
-                await show_phone_btn.click()
-                await self.page.wait_for_timeout(500)
+                try:
+                    await show_phone_btn.click()
+                    await self.page.wait_for_selector("a[href^='tel:']", state="visible", timeout=2000)
+                except PlaywrightTimeoutError:
+                    st.outcome = "timeout"
 
-            phone_elem = self.page.locator("a[href^='tel:']").first
-            if await phone_elem.is_visible():
-                info["phone"] = clean_text(await phone_elem.text_content())
+            contacts = await self.page.evaluate(ORG_CONTACTS_JS)
+        info["phone"] = clean_text(contacts["phone"])
+        info["comments"] = clean_text(contacts["comments"])
 
-            comments_elem = self.page.locator("div._1p8iqzw").first
-            if await comments_elem.is_visible():
-                info["comments"] = clean_text(await comments_elem.text_content())
+        return info
 
-        except PlaywrightTimeoutError:
-            pass
 
-        return info
+async def _scrape_house(city_url: str, search_query: str) -> Optional[dict]:
+    async with parser_pool.lease() as page:
+        parser = DGisParser(page=page)
+        results, is_direct = await parser.search_addresses(search_query, city_url)
 
+        if is_direct:
+            return await parser.parse_address()
+        if results:
+            return await parser.parse_address(results[0]['url'])
+        return None
 
-async def parse_house_from_2gis(city_url: str, search_query: str) -> Optional[dict]:
-    parser = DGisParser(headless=False)
-    await parser.start()
 
-    try:
-        results, is_direct = await parser.search_addresses(search_query, city_url)
+# Дополнительные вкладки кандидатов ЖЭУ сверх аренд пула — общий лимит на процесс,
+# чтобы одновременные поиски не открывали их по PARSER_CANDIDATE_TABS каждый
+candidate_tabs = asyncio.Semaphore(PARSER_CANDIDATE_TABS)
 
+
+async def _parse_candidate(context: BrowserContext, url: str) -> Optional[dict]:
+    """Открывает карточку организации в отдельной вкладке, не трогая выдачу."""
+    async with candidate_tabs:
+        # Размер окна вкладка наследует от контекста пула
+        page = await context.new_page()
+        try:
+            info = await DGisParser(page=page).parse_organization(url)
+            return info if info.get("title") else None
+        finally:
+            await page.close()
+
+
+async def _scrape_housing_office(city_url: str, org_name: str) -> Optional[dict]:
+    async with parser_pool.lease() as page:
+        parser = DGisParser(page=page)
+        outcome = await parser.submit_search(org_name, city_url)
+        if outcome == "card":
+            info = await parser.parse_organization()
+            return info if info.get("title") else None
+        if outcome == "empty":
+            return None
+
+        # Ранг кандидата — позиция первого совпавшего ключевого слова; при равенстве важен порядок выдачи
+        candidates = []
+        for block in await parser.extract_search_results():
+            type_ = block["type"].lower()
+            rank = next((i for i, k in enumerate(HOUSING_OFFICE_KEYWORDS) if k in type_), None)
+            if rank is not None and block["href"]:
+                candidates.append((rank, f"https://2gis.ru{block['href'].strip()}"))
+        candidates.sort(key=lambda c: c[0])
+
+        tasks = [
+            asyncio.create_task(_parse_candidate(page.context, url))
+            for _, url in candidates
+        ]
+        failure: Optional[Exception] = None
+        try:
+            # Ждём в порядке ранга: первый успешный и есть лучший, остальные можно отменить
+            for task in tasks:
+                try:
+                    info = await task
+                except Exception as e:
+                    logger.exception("Не удалось разобрать карточку организации")
+                    failure = e
+                    continue
+                if info:
+                    return info
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Ни одна карточка не загрузилась — это сбой 2ГИС, а не «ЖЭУ не найдено»
+    if failure is not None:
+        raise failure
+    return None
+
+
+async def _scrape_search_page(city_url: str, query: str, page_no: int) -> List[dict]:
+    """
+    Дома с одной страницы выдачи; пустой список — 2ГИС подтвердил, что страниц
+    больше нет. Если страница не загрузилась, DGisSelectorMiss пробрасывается.
+    """
+    async with parser_pool.lease() as page:
+        parser = DGisParser(page=page)
+        results, is_direct = await parser.search_addresses(query, city_url, page_no)
         if is_direct:
-            info = await parser.parse_address()
-        elif results:
-            info = await parser.parse_address(results[0]['url'])
-        else:
-            info = None
+            return [{"title": "", "url": page.url}]
+        return results
 
-    except Exception as e:
-        await parser.stop()
-        raise e
 
-    await parser.stop()
-    return info
+async def _scrape_house_url(url: str) -> dict:
+    async with parser_pool.lease() as page:
+        return await DGisParser(page=page).parse_address(url)
+
+
+SCRAPERS = {
+    "house": _scrape_house,
+    "housing_office": _scrape_housing_office,
+    "search_page": _scrape_search_page,
+    "house_url": _scrape_house_url,
+}
 
 
+def _city_tag(url: str) -> str:
+    """https://2gis.ru/kazan/geo/123 -> kazan"""
+    return urlparse(url).path.strip("/").split("/")[0]
 
-async def parse_housing_office_from_2gis(city_url: str, org_name: str) -> Optional[dict]:
+
+async def _scrape(kind: str, *args):
+    # Пока 2ГИС недоступен, отказываем сразу, а не ждём таймаутов
+    dgis_breaker.check()
+    try:
+        with lookup_trace(kind, _city_tag(args[0])):
+            # При PARSER_WORKERS > 0 браузер работает в отдельных процессах
+            if parser_workers.enabled:
+                result = await parser_workers.scrape(kind, *args)
+            else:
+                result = await SCRAPERS[kind](*args)
+    except (DGisSelectorMiss, PlaywrightError):
+        # Сбой страницы — не «не найдено»: пробрасываем, чтобы он не попал в кэш
+        dgis_breaker.record_failure()
+        raise
+    else:
+        # Пустая выдача 2ГИС — нормальный ответ, а не сбой
+        dgis_breaker.record_success()
+        return result
+    finally:
+        # Пробный запрос мог оборваться отменой или ошибкой воркера — следующий пробует снова
+        dgis_breaker.release_probe()
+
+
+async def parse_house_from_2gis(
+    city_url: str,
+    search_query: str,
+    user_id: int = 0,
+    on_queued: Optional[QueuedCallback] = None,
+    on_started: Optional[StartedCallback] = None
+) -> Optional[dict]:
+    """
+    Ищет дом в 2ГИС через кэш и общую очередь парсинга.
+    Одинаковые одновременные запросы выполняются один раз, а о месте
+    в очереди и старте узнаёт каждый из ожидающих.
+    Бросает ScrapeQueueFull, если очередь переполнена.
+    """
+    # «ул. Тимирязева, 4» и «Тимирязева 4» — один запрос к 2ГИС и одна запись в кэше
+    query_key = house_query_key(search_query)
+    return await scrape_flights.do(
+        scrape_key("house", city_url, query_key),
+        lambda flight: scrape_cache.cached(
+            "house", city_url, query_key,
+            lambda: scrape_scheduler.run(
+                user_id, lambda: _scrape("house", city_url, search_query), flight.on_queued, flight.on_started
+            )
+        ),
+        on_queued, on_started
+    )
+
+
+async def parse_housing_office_from_2gis(
+    city_url: str,
+    org_name: str,
+    user_id: int = 0,
+    on_queued: Optional[QueuedCallback] = None,
+    on_started: Optional[StartedCallback] = None
+) -> Optional[dict]:
     """
     Ищет организацию по названию в 2ГИС и возвращает инфо о первой ЖЭУ/УК/ТСЖ.
+    Результат берётся из кэша, если он есть; одинаковые одновременные
+    запросы выполняются один раз.
+    Бросает ScrapeQueueFull, если очередь переполнена.
     """
-    parser = DGisParser(headless=False)
-    await parser.start()
+    return await scrape_flights.do(
+        scrape_key("housing_office", city_url, org_name),
+        lambda flight: scrape_cache.cached(
+            "housing_office", city_url, org_name,
+            lambda: scrape_scheduler.run(
+                user_id, lambda: _scrape("housing_office", city_url, org_name), flight.on_queued, flight.on_started
+            )
+        ),
+        on_queued, on_started
+    )
 
-    try:
-        await parser.page.goto(city_url)
-        await parser.page.wait_for_selector("input[placeholder='Поиск в 2ГИС']", timeout=10000)
-        await parser.page.fill("input[placeholder='Поиск в 2ГИС']", org_name)
-        await parser.page.keyboard.press("Enter")
-        await parser.page.wait_for_timeout(4000)
-
-        await parser.page.wait_for_selector("div._awwm2v", timeout=5000)
-        blocks = parser.page.locator("div._awwm2v div._1kf6gff")
-        count = await blocks.count()
-
-        keywords = ["жэу", "жэк", "управляющая компания", "жилищно-коммунальные", "тсж", "дэз", "эксплуатация"]
-
-        for i in range(count):
-            type_elem = blocks.nth(i).locator("div._1idnaau span._oqoid").first
-            type_text = await type_elem.text_content() if await type_elem.count() else ""
-            if not any(k in (type_text or "").lower() for k in keywords):
-                continue
-
-            href = await blocks.nth(i).locator("a._1rehek").first.get_attribute("href")
-            if href:
-                info = await parser.parse_organization(f"https://2gis.ru{href.strip()}")
-                if info.get("title"):
-                    await parser.stop()
-                    return info
-    except Exception as e:
-        await parser.stop()
-        raise e
 
-    await parser.stop()
-    return None
+async def search_houses_page(city_url: str, query: str, page_no: int, user_id: int = 0) -> List[dict]:
+    """Страница выдачи для массового обхода — без кэша, но через общую очередь."""
+    return await scrape_scheduler.run(user_id, lambda: _scrape("search_page", city_url, query, page_no))
+
+
+async def parse_house_by_url(url: str, user_id: int = 0) -> dict:
+    return await scrape_scheduler.run(user_id, lambda: _scrape("house_url", url))
+
+
+async def refresh_house_from_2gis(city_url: str, search_query: str, user_id: int = 0) -> Optional[dict]:
+    """Свежие данные дома мимо кэша; результат заменяет запись в кэше."""
+    info = await scrape_scheduler.run(user_id, lambda: _scrape("house", city_url, search_query))
+    if info is not None:
+        try:
+            await scrape_cache.put("house", city_url, house_query_key(search_query), info)
+        except Exception:
+            logger.exception("Не удалось сохранить результат парсинга в кэш")
+    return info
 
 
 #if __name__ == '__main__':
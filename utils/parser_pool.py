@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Error as PlaywrightError
+
+from utils.request_filter import request_filter
+from utils.auth_storage import check_session_freshness, load_storage_state
+from utils.metrics import stage
+from utils.browser_memory import chromium_rss
+from config import (
+    PARSER_HEADLESS,
+    PARSER_POOL_SIZE,
+    PARSER_PAGE_MAX_NAVIGATIONS,
+    PARSER_PAGE_MAX_HEAP_MB,
+    PARSER_CONTEXT_MAX_LEASES,
+    PARSER_BROWSER_MAX_RSS_MB,
+    PARSER_WATCHDOG_INTERVAL,
+    PARSER_STORAGE_STATE,
+)
+
+
+logger = logging.getLogger(__name__)
+
+HEAP_SIZE_JS = "() => (performance.memory && performance.memory.usedJSHeapSize) || 0"
+
+# Как часто сторож перечитывает срок сессии 2ГИС (с): вкладки могут жить дольше её
+SESSION_CHECK_INTERVAL = 3600
+
+
+class PooledPage:
+    """Прогретая вкладка пула в своём контексте и её счётчики для решения о пересоздании."""
+
+    def __init__(self, context: BrowserContext, page: Page):
+        self.context = context
+        self.page = page
+        self.navigations = 0
+        self.leases = 0
+        page.on("framenavigated", self._on_navigated)
+
+    def _on_navigated(self, frame) -> None:
+        if frame == self.page.main_frame:
+            self.navigations += 1
+
+
+class ParserPool:
+    """
+    Общий на весь процесс браузер 2ГИС с N прогретыми вкладками.
+    Каждая вкладка живёт в отдельном контексте с сессией из storage_state,
+    поэтому профиль Chromium не блокируется и пулов на хосте может быть несколько.
+
+    Вкладки выдаются в аренду на время одного поиска, а их контекст пересоздаётся
+    после заданного числа переходов или аренд либо при превышении лимита JS-heap.
+    Сторож памяти периодически замеряет RSS браузера и рендереров; при превышении
+    лимита новые аренды ждут, активные доигрывают, и браузер перезапускается.
+    """
+
+    def __init__(
+        self,
+        size: int = PARSER_POOL_SIZE,
+        headless: bool = PARSER_HEADLESS,
+        max_navigations: int = PARSER_PAGE_MAX_NAVIGATIONS,
+        max_heap_mb: int = PARSER_PAGE_MAX_HEAP_MB,
+        max_leases: int = PARSER_CONTEXT_MAX_LEASES,
+        max_rss_mb: int = PARSER_BROWSER_MAX_RSS_MB,
+        watchdog_interval: float = PARSER_WATCHDOG_INTERVAL,
+        storage_state: str = PARSER_STORAGE_STATE,
+    ):
+        self.size = size
+        self.headless = headless
+        self.max_navigations = max_navigations
+        self.max_heap_bytes = max_heap_mb * 1024 * 1024
+        self.max_leases = max_leases
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.watchdog_interval = watchdog_interval
+        self.storage_state = storage_state
+
+        self.playwright = None
+        self.browser: Optional[Browser] = None
+        self._slots: List[PooledPage] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        # Закрыт, пока браузер перезапускается: новые аренды ждут
+        self._gate = asyncio.Event()
+        self._gate.set()
+        self._watchdog: Optional[asyncio.Task] = None
+        self.recycled = 0
+        self.recycle_reasons: Dict[str, int] = {}
+        self.browser_restarts = 0
+        self.rss_bytes: Optional[int] = None
+        self.heap_bytes = 0
+        self.session_expires_at: Optional[datetime] = None
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._started:
+                return
+            logger.info("Запускаем пул парсера 2ГИС (%s вкладок)", self.size)
+            # Очередь сохраняется после неудачного перезапуска: аренды, ждущие в ней, получат новые вкладки
+            if self._idle is None:
+                self._idle = asyncio.Queue()
+            try:
+                with stage("browser_start"):
+                    self.playwright = await async_playwright().start()
+                    await self._launch()
+            except Exception:
+                await self._discard_browser()
+                raise
+            self._started = True
+            if self.watchdog_interval > 0 and (self._watchdog is None or self._watchdog.done()):
+                self._watchdog = asyncio.create_task(self._watch())
+
+    async def _launch(self) -> None:
+        self.browser = await self.playwright.chromium.launch(
+            headless=self.headless,
+            slow_mo=50,
+            args=[]
+        )
+        self._slots = []
+        for _ in range(self.size):
+            slot = await self._new_slot()
+            self._slots.append(slot)
+            self._idle.put_nowait(slot)
+
+    async def _discard_browser(self) -> None:
+        """Закрывает браузер после сбоя запуска и убирает из очереди вкладки, которые успели создаться."""
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        self._slots = []
+        try:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+        except Exception:
+            logger.warning("Не удалось закрыть браузер парсера после сбоя", exc_info=True)
+        self.browser = None
+        self.playwright = None
+
+    async def stop(self, drain_timeout: float = 30) -> None:
+        if self._watchdog:
+            self._watchdog.cancel()
+            await asyncio.gather(self._watchdog, return_exceptions=True)
+            self._watchdog = None
+        async with self._start_lock:
+            if not self._started:
+                return
+            self._started = False
+            # Даём активным арендам закончиться, но не ждём бесконечно
+            try:
+                await asyncio.wait_for(self._wait_all_idle(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Пул парсера 2ГИС остановлен с незавершёнными арендами")
+            with stage("teardown"):
+                if self.browser:
+                    await self.browser.close()
+                if self.playwright:
+                    await self.playwright.stop()
+            self.browser = None
+            self.playwright = None
+            self._slots = []
+            self._idle = None
+            logger.info("Пул парсера 2ГИС остановлен")
+
+    async def _wait_all_idle(self) -> None:
+        while self._idle.qsize() < len(self._slots):
+            await asyncio.sleep(0.1)
+
+    async def _new_slot(self) -> PooledPage:
+        # Сессию перечитываем с диска: после повторного входа файл мог обновиться.
+        # Заодно проверяем её срок — вкладки пересоздаются регулярно
+        self.session_expires_at = check_session_freshness(self.storage_state)
+        context = await self.browser.new_context(
+            storage_state=load_storage_state(self.storage_state),
+            viewport={"width": 1920, "height": 1080},
+        )
+        await request_filter.install(context)
+        page = await context.new_page()
+        await page.goto("https://2gis.ru")
+        return PooledPage(context, page)
+
+    async def _needs_recycle(self, slot: PooledPage) -> Optional[str]:
+        """Причина пересоздать контекст вкладки или None, если он ещё годен."""
+        if slot.page.is_closed():
+            return "closed"
+        if slot.navigations >= self.max_navigations:
+            return "navigations"
+        if slot.leases >= self.max_leases:
+            return "leases"
+        try:
+            heap = await slot.page.evaluate(HEAP_SIZE_JS)
+        except PlaywrightError:
+            return "crashed"
+        if heap >= self.max_heap_bytes:
+            return "heap"
+        return None
+
+    def _count_recycle(self, reason: str) -> None:
+        self.recycled += 1
+        self.recycle_reasons[reason] = self.recycle_reasons.get(reason, 0) + 1
+
+    async def _recycle(self, slot: PooledPage, reason: str) -> PooledPage:
+        logger.info(
+            "Пересоздаём вкладку парсера (%s): %s переходов, %s аренд",
+            reason, slot.navigations, slot.leases
+        )
+        try:
+            await slot.context.close()
+        except PlaywrightError:
+            pass
+        with stage("page_recycle"):
+            new_slot = await self._new_slot()
+        self._slots[self._slots.index(slot)] = new_slot
+        self._count_recycle(reason)
+        return new_slot
+
+    async def _watch(self) -> None:
+        session_checked_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.watchdog_interval)
+            try:
+                if not self._started:
+                    # Перезапуск браузера не удался: поднимаем пул, не дожидаясь новой аренды
+                    await self.start()
+                    continue
+                await self._check_memory()
+                if time.monotonic() - session_checked_at >= SESSION_CHECK_INTERVAL:
+                    session_checked_at = time.monotonic()
+                    self.session_expires_at = check_session_freshness(self.storage_state)
+            except Exception:
+                logger.exception("Ошибка сторожа памяти парсера")
+
+    async def _sample_heap(self) -> int:
+        total = 0
+        for slot in list(self._slots):
+            try:
+                total += await slot.page.evaluate(HEAP_SIZE_JS)
+            except PlaywrightError:
+                pass
+        return total
+
+    async def _check_memory(self) -> None:
+        self.rss_bytes = await asyncio.to_thread(chromium_rss)
+        self.heap_bytes = await self._sample_heap()
+        # Без psutil ориентируемся на JS-heap вкладок — он меньше RSS, но растёт вместе с ним
+        used = self.rss_bytes if self.rss_bytes is not None else self.heap_bytes
+        if used >= self.max_rss_bytes:
+            logger.warning(
+                "Браузер парсера занял %.0f МБ (лимит %.0f МБ), перезапускаем",
+                used / 1024 / 1024, self.max_rss_bytes / 1024 / 1024
+            )
+            await self._restart_browser()
+
+    async def _restart_browser(self) -> None:
+        """Закрывает приём аренд, дожидается активных и поднимает браузер заново."""
+        async with self._start_lock:
+            if not self._started:
+                return
+            self._gate.clear()
+            drained = []
+            try:
+                while len(drained) < len(self._slots):
+                    drained.append(await self._idle.get())
+                with stage("browser_restart"):
+                    try:
+                        await self.browser.close()
+                    except PlaywrightError:
+                        pass
+                    await self._launch()
+            except asyncio.CancelledError:
+                # Остановка пула во время перезапуска: возвращаем вкладки, чтобы stop не ждал их
+                for slot in drained:
+                    self._idle.put_nowait(slot)
+                raise
+            except Exception:
+                # Браузер не поднялся или поднялся не целиком: пул считается остановленным,
+                # и следующая аренда запустит его заново в ту же очередь
+                logger.exception("Не удалось перезапустить браузер парсера")
+                self._started = False
+                await self._discard_browser()
+                return
+            finally:
+                self._gate.set()
+            self.browser_restarts += 1
+            self._count_recycle("memory")
+            logger.info("Браузер парсера перезапущен (%s раз)", self.browser_restarts)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Page]:
+        """Выдаёт свободную вкладку на время одного поиска."""
+        if not self._started:
+            await self.start()
+
+        await self._gate.wait()
+        slot = await self._idle.get()
+        slot.leases += 1
+        try:
+            yield slot.page
+        finally:
+            try:
+                reason = await self._needs_recycle(slot)
+                if reason:
+                    slot = await self._recycle(slot, reason)
+            except Exception:
+                logger.exception("Не удалось пересоздать вкладку парсера")
+            if self._idle is not None:
+                self._idle.put_nowait(slot)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "recycled": self.recycled,
+            "recycle_reasons": dict(self.recycle_reasons),
+            "browser_restarts": self.browser_restarts,
+            "rss_mb": self.rss_bytes / 1024 / 1024 if self.rss_bytes is not None else None,
+            "heap_mb": self.heap_bytes / 1024 / 1024,
+            "session_expires_at": self.session_expires_at,
+            "requests": request_filter.stats(),
+        }
+
+
+parser_pool = ParserPool()
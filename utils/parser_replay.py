@@ -0,0 +1,55 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
+from playwright.async_api import Browser
+
+from utils.parser import DGisParser
+from utils.request_filter import request_filter
+
+
+CORPUS_DIR = os.path.join("fixtures", "2gis")
+MANIFEST_NAME = "cases.json"
+
+
+def load_cases(corpus_dir: str = CORPUS_DIR) -> List[dict]:
+    with open(os.path.join(corpus_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cases(cases: List[dict], corpus_dir: str = CORPUS_DIR) -> None:
+    with open(os.path.join(corpus_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(cases, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def har_path(case: dict, corpus_dir: str = CORPUS_DIR) -> str:
+    return os.path.join(corpus_dir, f"{case['name']}.har")
+
+
+@asynccontextmanager
+async def har_parser(browser: Browser, path: str, record: bool = False) -> AsyncIterator[DGisParser]:
+    """
+    DGisParser в отдельном контексте, который пишет (record=True) или
+    отдаёт (record=False) весь трафик страницы из HAR-файла.
+    При воспроизведении всё, чего нет в HAR, обрывается — сеть не нужна,
+    а ограничение частоты и повторы переходов выключены, чтобы не искажать
+    замеры. Снимки карточек в архив не пишутся ни в одном режиме.
+    """
+    context = await browser.new_context(viewport={"width": 1920, "height": 1080})
+    # Фильтр ставится первым, HAR — поверх него: при записи в архив попадает
+    # только то, что реально нужно парсеру
+    await request_filter.install(context)
+    await context.route_from_har(
+        path,
+        not_found="abort",
+        update=record,
+        update_content="embed",
+    )
+    page = await context.new_page()
+    try:
+        yield DGisParser(page=page, snapshots=False, throttled=record)
+    finally:
+        # HAR дописывается на диск при закрытии контекста
+        await context.close()
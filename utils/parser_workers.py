@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Set
+
+from utils.metrics import collect_stages, merge_stages
+from config import (
+    PARSER_WORKERS,
+    PARSER_WORKER_PING_INTERVAL,
+    PARSER_WORKER_PING_TIMEOUT,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class ParserWorkerError(Exception):
+    """Процесс парсера упал или не ответил — задача не выполнена."""
+
+
+# === Код, который выполняется внутри процесса-воркера ===
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _worker_logging() -> None:
+    """Свой файл лога на процесс: строки разных воркеров не перемешиваются в общем файле бота."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.FileHandler):
+            root.removeHandler(handler)
+            handler.close()
+            base, ext = os.path.splitext(handler.baseFilename)
+            worker_handler = logging.FileHandler(f"{base}.worker-{os.getpid()}{ext}", encoding="utf-8")
+            worker_handler.setFormatter(handler.formatter)
+            root.addHandler(worker_handler)
+
+
+def _worker_init() -> None:
+    global _loop
+    # Ctrl+C получает бот, воркеры он останавливает сам
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_logging()
+
+    from utils.parser_pool import parser_pool
+    from utils.rate_limit import dgis_limiter
+
+    # Воркер выполняет один поиск за раз, поэтому ему хватает одной вкладки
+    parser_pool.size = 1
+    # Общий лимит частоты делится между процессами
+    dgis_limiter.max_rate = dgis_limiter.rate = dgis_limiter.max_rate / PARSER_WORKERS
+    # Loop крутится постоянно в отдельном потоке: сторож памяти и проверка сессии
+    # пула работают и между поисками, когда простаивающий браузер и стоит пересоздать
+    _loop = asyncio.new_event_loop()
+    threading.Thread(target=_loop.run_forever, name="parser-loop", daemon=True).start()
+
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+async def _ping() -> int:
+    from utils.parser_pool import parser_pool
+
+    async with parser_pool.lease() as page:
+        await page.evaluate("1")
+    return os.getpid()
+
+
+def _worker_ping() -> int:
+    return _run(_ping())
+
+
+async def _scrape_with_stages(kind: str, *args):
+    from utils.parser import SCRAPERS
+
+    with collect_stages() as trace:
+        result = await SCRAPERS[kind](*args)
+    return result, trace.stages
+
+
+def _worker_scrape(kind: str, *args):
+    """Результат парсинга и замеры этапов, которые бот добавит в свою статистику."""
+    return _run(_scrape_with_stages(kind, *args))
+
+
+def _worker_shutdown() -> None:
+    from utils.parser_pool import parser_pool
+
+    _run(parser_pool.stop())
+    _loop.call_soon_threadsafe(_loop.stop)
+
+
+# === Управление воркерами из процесса бота ===
+
+class ParserWorker:
+    """Один процесс с собственным браузером и event loop'ом."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pid: Optional[int] = None
+        self.lock = asyncio.Lock()
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.executor is not None and self.pid is not None
+
+    async def call(self, fn, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self.executor, fn, *args), timeout=timeout)
+
+    async def start(self) -> None:
+        # spawn, а не fork: дочерний процесс не должен наследовать loop и соединения бота
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+        )
+        # Первый пинг поднимает браузер и прогревает вкладку
+        self.pid = await self.call(_worker_ping)
+        logger.info("Воркер парсера #%s запущен (pid %s)", self.index, self.pid)
+
+    def kill(self) -> None:
+        if self.pid:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.pid = None
+
+    async def restart(self) -> None:
+        logger.warning("Перезапускаем воркер парсера #%s", self.index)
+        self.kill()
+        self.restarts += 1
+        await self.start()
+
+    async def stop(self, timeout: float) -> None:
+        if not self.executor:
+            return
+        try:
+            await self.call(_worker_shutdown, timeout=timeout)
+        except Exception:
+            logger.warning("Воркер парсера #%s не остановился штатно", self.index)
+            self.kill()
+            return
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        self.pid = None
+
+
+class ParserWorkerPool:
+    """
+    Пул процессов с DGisParser. Браузер и Playwright работают вне процесса бота,
+    поэтому тяжёлый парсинг не задерживает обработку сообщений.
+    Воркеры периодически пингуются; упавший или зависший процесс пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        size: int = PARSER_WORKERS,
+        ping_interval: float = PARSER_WORKER_PING_INTERVAL,
+        ping_timeout: float = PARSER_WORKER_PING_TIMEOUT,
+    ):
+        self.size = size
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+
+        self._workers: List[ParserWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._restarts: Set[asyncio.Task] = set()
+        self._start_lock = asyncio.Lock()
+        self._started = False
+
+        self.dispatched = 0
+        self.crashed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if not self.enabled or self._started:
+                return
+            logger.info("Запускаем %s процессов парсера 2ГИС", self.size)
+            self._idle = asyncio.Queue()
+            for index in range(self.size):
+                worker = ParserWorker(index)
+                self._workers.append(worker)
+                try:
+                    await worker.start()
+                except Exception:
+                    logger.exception("Не удалось запустить воркер парсера #%s", index)
+                    self._schedule_restart(worker)
+                    continue
+                self._idle.put_nowait(worker)
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+
+    async def stop(self, drain_timeout: float = 30) -> None:
+        async with self._start_lock:
+            if not self._started:
+                return
+            self._started = False
+            self._health_task.cancel()
+            for task in list(self._restarts):
+                task.cancel()
+            await asyncio.gather(*[w.stop(drain_timeout) for w in self._workers], return_exceptions=True)
+            self._workers = []
+            self._idle = None
+            logger.info("Процессы парсера 2ГИС остановлены")
+
+    def _schedule_restart(self, worker: ParserWorker) -> None:
+        async def restart():
+            async with worker.lock:
+                while True:
+                    try:
+                        await worker.restart()
+                        break
+                    except Exception:
+                        logger.exception("Воркер парсера #%s не поднялся, повторим позже", worker.index)
+                        worker.kill()
+                        await asyncio.sleep(self.ping_interval)
+            if self._idle is not None:
+                self._idle.put_nowait(worker)
+
+        task = asyncio.create_task(restart())
+        self._restarts.add(task)
+        task.add_done_callback(self._restarts.discard)
+
+    async def scrape(self, kind: str, *args):
+        if not self._started:
+            await self.start()
+
+        worker = await self._idle.get()
+        self.dispatched += 1
+        healthy = False
+        try:
+            async with worker.lock:
+                result, stages = await worker.call(_worker_scrape, kind, *args)
+            healthy = True
+            merge_stages(stages)
+            return result
+        except BrokenProcessPool:
+            self.crashed += 1
+            raise ParserWorkerError(f"Воркер парсера #{worker.index} упал во время поиска")
+        except Exception:
+            # Ошибка самого парсинга пришла из живого процесса
+            healthy = True
+            raise
+        finally:
+            # Отменённый по таймауту поиск продолжает занимать процесс — пересоздаём его
+            if healthy:
+                self._idle.put_nowait(worker)
+            elif self._started:
+                self._schedule_restart(worker)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            # Пингуем только свободные воркеры: занятый и так отчитается результатом
+            for _ in range(self._idle.qsize()):
+                worker = self._idle.get_nowait()
+                try:
+                    async with worker.lock:
+                        await worker.call(_worker_ping, timeout=self.ping_timeout)
+                except (BrokenProcessPool, asyncio.TimeoutError):
+                    self.crashed += 1
+                    logger.warning("Воркер парсера #%s не отвечает на пинг", worker.index)
+                    self._schedule_restart(worker)
+                    continue
+                except Exception:
+                    logger.exception("Ошибка пинга воркера парсера #%s", worker.index)
+                self._idle.put_nowait(worker)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": sum(1 for w in self._workers if w.alive),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "restarts": sum(w.restarts for w in self._workers),
+            "crashed": self.crashed,
+            "dispatched": self.dispatched,
+        }
+
+
+parser_workers = ParserWorkerPool()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+
+from config import (
+    PARSER_RATE_PER_SEC,
+    PARSER_RATE_BURST,
+    PARSER_RETRY_ATTEMPTS,
+    PARSER_RETRY_BASE_DELAY,
+    PARSER_BREAKER_THRESHOLD,
+    PARSER_BREAKER_COOLDOWN,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class DGisUnavailable(Exception):
+    """2ГИС недоступен: предохранитель разомкнут, запросы отклоняются сразу."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"2ГИС недоступен, повтор через {retry_after:.0f} с")
+        self.retry_after = retry_after
+
+
+class DGisSelectorMiss(Exception):
+    """Страница 2ГИС не показала ни выдачу, ни карточку за отведённое время."""
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты переходов к 2ГИС. Скорость адаптивная: при ошибках
+    уменьшается вдвое, при успехах постепенно возвращается к максимуму.
+    """
+
+    def __init__(self, rate: float = PARSER_RATE_PER_SEC, burst: int = PARSER_RATE_BURST, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # Под замком ждущие получают токены строго по очереди
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def slow_down(self) -> None:
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self) -> None:
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "max_rate": self.max_rate}
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после threshold ошибок подряд размыкается на cooldown секунд
+    и сразу отклоняет запросы. Затем пропускает один пробный запрос.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = PARSER_BREAKER_THRESHOLD, cooldown: float = PARSER_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+        self.trips = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def check(self) -> None:
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise DGisUnavailable(self.retry_after())
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise DGisUnavailable(self.cooldown)
+            self._probing = True
+
+    def release_probe(self) -> None:
+        """Пробный запрос завершился без вердикта (отмена, ошибка воркера) — пропускаем следующий."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("2ГИС снова отвечает, предохранитель замкнут")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(
+                    "2ГИС не отвечает (%s ошибок подряд), отклоняем запросы %s с",
+                    self.failures, self.cooldown
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": self.retry_after() if self.state == self.OPEN else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+async def retry(
+    factory: Callable[[], Awaitable[Any]],
+    retry_on: Tuple[Type[BaseException], ...],
+    attempts: int = PARSER_RETRY_ATTEMPTS,
+    base_delay: float = PARSER_RETRY_BASE_DELAY,
+    on_retry: Optional[Callable[[BaseException], None]] = None,
+    no_retry_on: Tuple[Type[BaseException], ...] = (),
+    deadline: Optional[float] = None,
+) -> Any:
+    """
+    Повторяет factory при временных ошибках с экспоненциальной задержкой и джиттером.
+    Ошибки no_retry_on пробрасываются сразу, даже если подходят под retry_on.
+    deadline — момент time.monotonic(), после которого повторов больше нет.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await factory()
+        except no_retry_on:
+            raise
+        except retry_on as e:
+            if attempt == attempts:
+                raise
+            delay = random.uniform(0, base_delay * 2 ** (attempt - 1))
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if on_retry:
+                on_retry(e)
+            logger.info("Повтор запроса к 2ГИС через %.1f с (%s/%s): %s", delay, attempt, attempts, e)
+            await asyncio.sleep(delay)
+
+
+dgis_limiter = TokenBucket()
+dgis_breaker = CircuitBreaker()
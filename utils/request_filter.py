@@ -0,0 +1,85 @@
+import logging
+from collections import Counter
+from typing import Iterable
+
+from playwright.async_api import BrowserContext, Route, Request, Error as PlaywrightError
+
+from config import (
+    PARSER_BLOCK_RESOURCE_TYPES,
+    PARSER_BLOCK_URL_PATTERNS,
+    PARSER_ALLOW_URL_PATTERNS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Заблокированные ответы не скачиваются, поэтому экономию трафика
+# оцениваем по типичному размеру ресурса каждого типа
+TYPICAL_SIZE_BYTES = {
+    "image": 25_000,
+    "font": 40_000,
+    "media": 200_000,
+    "script": 60_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_SIZE_BYTES = 10_000
+
+
+class RequestFilter:
+    """
+    Отбрасывает в контексте браузера запросы, не нужные для чтения карточек:
+    картинки, шрифты, тайлы карты, аналитику. Разрешающие шаблоны важнее
+    запрещающих.
+    """
+
+    def __init__(
+        self,
+        block_types: Iterable[str] = PARSER_BLOCK_RESOURCE_TYPES,
+        block_patterns: Iterable[str] = PARSER_BLOCK_URL_PATTERNS,
+        allow_patterns: Iterable[str] = PARSER_ALLOW_URL_PATTERNS,
+    ):
+        self.block_types = set(block_types)
+        self.block_patterns = list(block_patterns)
+        self.allow_patterns = list(allow_patterns)
+
+        self.allowed = 0
+        self.blocked = Counter()
+        self.bytes_saved = 0
+
+    def should_block(self, request: Request) -> bool:
+        url = request.url
+        if any(pattern in url for pattern in self.allow_patterns):
+            return False
+        if request.resource_type in self.block_types:
+            return True
+        return any(pattern in url for pattern in self.block_patterns)
+
+    async def install(self, context: BrowserContext) -> None:
+        await context.route("**/*", self._handle)
+
+    async def _handle(self, route: Route) -> None:
+        request = route.request
+        if not self.should_block(request):
+            self.allowed += 1
+            await route.fallback()
+            return
+
+        self.blocked[request.resource_type] += 1
+        self.bytes_saved += TYPICAL_SIZE_BYTES.get(request.resource_type, DEFAULT_SIZE_BYTES)
+        try:
+            await route.abort()
+        except PlaywrightError:
+            # Страница уже закрыта или запрос отменён самим браузером
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+request_filter = RequestFilter()
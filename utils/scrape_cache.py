@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from db.db import async_session
+from db.models import msk_now
+from db.crud.scrape_cache import (
+    get_scrape_cache_entry,
+    upsert_scrape_cache_entry,
+    evict_scrape_cache,
+)
+from config import (
+    SCRAPE_CACHE_TTL_HOURS,
+    SCRAPE_CACHE_NEGATIVE_TTL_HOURS,
+    SCRAPE_CACHE_LRU_SIZE,
+    SCRAPE_CACHE_MAX_ROWS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+MISS = object()
+
+
+def normalize_query(query: str) -> str:
+    query = query.lower().replace("ё", "е")
+    query = re.sub(r"[,.;]+", " ", query)
+    return " ".join(query.split())
+
+
+def scrape_key(kind: str, city_url: str, query: str) -> str:
+    raw = f"{kind}|{city_url.rstrip('/')}|{normalize_query(query)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ScrapeCache:
+    """
+    Кэш результатов парсинга 2ГИС: таблица scrape_cache и LRU в памяти перед ней.
+    Ключ — (тип, City.url, нормализованный запрос). None кэшируется как «не найдено»
+    на более короткий срок.
+    """
+
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(hours=SCRAPE_CACHE_TTL_HOURS),
+        negative_ttl: timedelta = timedelta(hours=SCRAPE_CACHE_NEGATIVE_TTL_HOURS),
+        lru_size: int = SCRAPE_CACHE_LRU_SIZE,
+        max_rows: int = SCRAPE_CACHE_MAX_ROWS,
+        evict_every: int = 100,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lru_size = lru_size
+        self.max_rows = max_rows
+        self.evict_every = evict_every
+
+        self._lru: "OrderedDict[str, Tuple[datetime, Any]]" = OrderedDict()
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, expires_at: datetime, value: Any) -> None:
+        self._lru[key] = (expires_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def get(self, kind: str, city_url: str, query: str) -> Any:
+        """Возвращает сохранённый результат (в т.ч. None) или MISS."""
+        key = scrape_key(kind, city_url, query)
+        now = msk_now()
+
+        cached = self._lru.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if expires_at > now:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._lru[key]
+
+        async with async_session() as session:
+            entry = await get_scrape_cache_entry(session, key, now)
+        if entry is None:
+            self.misses += 1
+            return MISS
+
+        value = json.loads(entry.payload) if entry.payload is not None else None
+        self._remember(key, entry.expires_at.replace(tzinfo=now.tzinfo), value)
+        self.db_hits += 1
+        return value
+
+    async def put(self, kind: str, city_url: str, query: str, value: Optional[dict]) -> None:
+        key = scrape_key(kind, city_url, query)
+        now = msk_now()
+        expires_at = now + (self.ttl if value is not None else self.negative_ttl)
+        self._remember(key, expires_at, value)
+
+        async with async_session() as session:
+            await upsert_scrape_cache_entry(
+                session,
+                key_hash=key,
+                kind=kind,
+                city_url=city_url,
+                query=normalize_query(query),
+                payload=json.dumps(value, ensure_ascii=False) if value is not None else None,
+                expires_at=expires_at,
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                await evict_scrape_cache(session, now, self.max_rows)
+
+    async def cached(
+        self,
+        kind: str,
+        city_url: str,
+        query: str,
+        factory: Callable[[], Awaitable[Optional[dict]]],
+    ) -> Optional[dict]:
+        try:
+            value = await self.get(kind, city_url, query)
+        except Exception:
+            # Кэш не должен ломать поиск
+            logger.exception("Не удалось прочитать кэш парсинга")
+            value = MISS
+        if value is not MISS:
+            return value
+
+        value = await factory()
+        try:
+            await self.put(kind, city_url, query, value)
+        except Exception:
+            logger.exception("Не удалось сохранить результат парсинга в кэш")
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "lru": len(self._lru),
+        }
+
+
+scrape_cache = ScrapeCache()
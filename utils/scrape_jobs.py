@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from config import SCRAPE_JOB_TIMEOUT
+from utils.scrape_queue import ScrapeQueueFull
+from utils.rate_limit import DGisUnavailable, DGisSelectorMiss
+
+
+logger = logging.getLogger(__name__)
+
+ProgressFn = Callable[[str], Awaitable[None]]
+
+
+class ScrapeJobPipeline:
+    """
+    Фоновые задачи парсинга 2ГИС. Обработчик сообщения ставит задачу и сразу
+    возвращается, а задача сама редактирует статусное сообщение пользователя:
+    очередь → поиск → итог, ошибка или таймаут.
+    """
+
+    def __init__(self, timeout: float = SCRAPE_JOB_TIMEOUT):
+        self.timeout = timeout
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    async def start(self) -> None:
+        self._closed = False
+
+    async def stop(self, drain_timeout: float = 30) -> None:
+        self._closed = True
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def edit(status: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        try:
+            await status.edit_text(text, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            # «message is not modified» и удалённые сообщения не считаем ошибкой задачи
+            logger.debug("Не удалось обновить статус парсинга: %s", e)
+
+    def submit(
+        self,
+        status: Message,
+        run: Callable[[ProgressFn], Awaitable[Any]],
+        on_result: Callable[[Any], Awaitable[None]],
+        on_failure: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> Optional[asyncio.Task]:
+        """on_failure вызывается, если до on_result дело не дошло: ошибка, таймаут, отмена."""
+        if self._closed:
+            asyncio.create_task(self.edit(status, "⚠️ Бот перезапускается, повторите поиск через минуту."))
+            if on_failure:
+                asyncio.create_task(on_failure())
+            return None
+
+        task = asyncio.create_task(self._run_job(status, run, on_result, on_failure))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.submitted += 1
+        return task
+
+    async def _run_job(
+        self,
+        status: Message,
+        run: Callable[[ProgressFn], Awaitable[Any]],
+        on_result: Callable[[Any], Awaitable[None]],
+        on_failure: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> None:
+        async def progress(text: str) -> None:
+            await self.edit(status, text)
+
+        finished = False
+        try:
+            result = await asyncio.wait_for(run(progress), timeout=self.timeout)
+            await on_result(result)
+            finished = True
+        except ScrapeQueueFull:
+            self.failed += 1
+            await self.edit(status, "🚦 Сейчас слишком много запросов к 2ГИС. Попробуйте через минуту.")
+        except DGisUnavailable as e:
+            self.failed += 1
+            await self.edit(
+                status,
+                f"🛑 2ГИС сейчас недоступен. Попробуйте через ~{max(1, round(e.retry_after / 60))} мин."
+            )
+        except DGisSelectorMiss:
+            self.failed += 1
+            logger.warning("2ГИС не показал выдачу", exc_info=True)
+            await self.edit(status, "⚠️ 2ГИС не загрузил страницу поиска. Попробуйте ещё раз через минуту.")
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            await self.edit(status, f"⌛ 2ГИС не ответил за {self.timeout:.0f} с. Попробуйте ещё раз позже.")
+        except asyncio.CancelledError:
+            await self.edit(status, "⚠️ Поиск прерван: бот перезапускается. Повторите запрос через минуту.")
+            raise
+        except Exception:
+            self.failed += 1
+            logger.exception("Ошибка фоновой задачи парсинга 2ГИС")
+            await self.edit(status, "❌ Ошибка при поиске в 2ГИС. Попробуйте ещё раз или обратитесь к администратору.")
+        else:
+            self.succeeded += 1
+        finally:
+            if not finished and on_failure:
+                try:
+                    await on_failure()
+                except Exception:
+                    logger.exception("Ошибка обработчика неудачной задачи парсинга")
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._tasks),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+
+scrape_jobs = ScrapeJobPipeline()
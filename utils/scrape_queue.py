@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Set
+
+from config import SCRAPE_CONCURRENCY, SCRAPE_QUEUE_MAX_DEPTH, SCRAPE_QUEUE_MAX_PER_USER
+
+
+logger = logging.getLogger(__name__)
+
+ScrapeFactory = Callable[[], Awaitable[Any]]
+QueuedCallback = Callable[[int, float], Awaitable[None]]
+StartedCallback = Callable[[], Awaitable[None]]
+
+
+class ScrapeQueueFull(Exception):
+    """Очередь парсинга переполнена — запрос отклонён."""
+
+
+class ScrapeTicket:
+    def __init__(self, user_id: int, factory: ScrapeFactory):
+        self.user_id = user_id
+        self.factory = factory
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.on_started: Optional[StartedCallback] = None
+
+
+class ScrapeScheduler:
+    """
+    Планировщик парсинга 2ГИС: общий лимит одновременных задач,
+    FIFO-очередь на пользователя и честная выдача по кругу между пользователями.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SCRAPE_CONCURRENCY,
+        max_depth: int = SCRAPE_QUEUE_MAX_DEPTH,
+        max_per_user: int = SCRAPE_QUEUE_MAX_PER_USER,
+        initial_duration: float = 5.0,
+    ):
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_per_user = max_per_user
+
+        self._queues: "OrderedDict[int, Deque[ScrapeTicket]]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = 0
+        self._avg_duration = initial_duration
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _waiting_order(self) -> List[ScrapeTicket]:
+        # Порядок выдачи: по одному запросу от каждого пользователя за круг
+        queues = [list(q) for q in self._queues.values()]
+        order = []
+        for i in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[i] for q in queues if i < len(q))
+        return order
+
+    def position(self, ticket: ScrapeTicket) -> int:
+        """Номер в очереди (с 1) или 0, если задача уже выполняется."""
+        try:
+            return self._waiting_order().index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def estimate_wait(self, position: int) -> float:
+        return math.ceil(position / self.concurrency) * self._avg_duration
+
+    def submit(self, user_id: int, factory: ScrapeFactory) -> ScrapeTicket:
+        user_queue = self._queues.get(user_id)
+        if self.depth >= self.max_depth or (user_queue and len(user_queue) >= self.max_per_user):
+            self.rejected += 1
+            raise ScrapeQueueFull()
+
+        ticket = ScrapeTicket(user_id, factory)
+        self._queues.setdefault(user_id, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def run(
+        self,
+        user_id: int,
+        factory: ScrapeFactory,
+        on_queued: Optional[QueuedCallback] = None,
+        on_started: Optional[StartedCallback] = None,
+    ) -> Any:
+        ticket = self.submit(user_id, factory)
+        position = self.position(ticket)
+        if position:
+            # Сообщать о старте имеет смысл, только если задача ждала в очереди
+            ticket.on_started = on_started
+            if on_queued:
+                await on_queued(position, self.estimate_wait(position))
+        return await ticket.future
+
+    def _next_ticket(self) -> Optional[ScrapeTicket]:
+        while self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # Пользователь уходит в конец круга, если у него остались запросы
+            del self._queues[user_id]
+            if queue:
+                self._queues[user_id] = queue
+            if not ticket.future.done():
+                return ticket
+        return None
+
+    def _dispatch(self) -> None:
+        while self._running < self.concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self._running += 1
+            task = asyncio.create_task(self._execute(ticket))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _notify_started(self, ticket: ScrapeTicket) -> None:
+        async def notify():
+            try:
+                await ticket.on_started()
+            except Exception:
+                logger.exception("Ошибка уведомления о старте парсинга")
+
+        task = asyncio.create_task(notify())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, ticket: ScrapeTicket) -> None:
+        started = time.monotonic()
+        if ticket.on_started:
+            self._notify_started(ticket)
+        try:
+            result = await ticket.factory()
+        except Exception as e:
+            self.failed += 1
+            if not ticket.future.done():
+                ticket.future.set_exception(e)
+            else:
+                logger.exception("Ошибка парсинга после отмены запроса")
+        else:
+            self.completed += 1
+            if not ticket.future.done():
+                ticket.future.set_result(result)
+        finally:
+            duration = time.monotonic() - started
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            self._running -= 1
+            self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "queued": self.depth,
+            "users": len(self._queues),
+            "max_depth": self.max_depth,
+            "max_per_user": self.max_per_user,
+            "avg_duration": self._avg_duration,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+scrape_scheduler = ScrapeScheduler()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils.scrape_queue import QueuedCallback, StartedCallback
+
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """
+    Один выполняющийся запрос и все, кто ждёт его результат. Уведомления
+    об очереди и старте получает каждый ожидающий, а не только первый.
+    """
+
+    def __init__(self):
+        self._queued: List[QueuedCallback] = []
+        self._started: List[StartedCallback] = []
+        self.queued_at: Optional[Tuple[int, float]] = None
+        self.started = False
+
+    def join(self, on_queued: Optional[QueuedCallback], on_started: Optional[StartedCallback]) -> None:
+        if on_queued:
+            self._queued.append(on_queued)
+        if on_started:
+            self._started.append(on_started)
+
+    def leave(self, on_queued: Optional[QueuedCallback], on_started: Optional[StartedCallback]) -> None:
+        if on_queued in self._queued:
+            self._queued.remove(on_queued)
+        if on_started in self._started:
+            self._started.remove(on_started)
+
+    async def _notify(self, calls: List[Awaitable[None]]) -> None:
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error("Ошибка уведомления ожидающего запроса", exc_info=result)
+
+    async def on_queued(self, position: int, eta: float) -> None:
+        self.queued_at = (position, eta)
+        await self._notify([callback(position, eta) for callback in list(self._queued)])
+
+    async def on_started(self) -> None:
+        self.started = True
+        await self._notify([callback() for callback in list(self._started)])
+
+
+class SingleFlight:
+    """
+    Склеивает одинаковые одновременные запросы: пока первый выполняется,
+    остальные ждут его результат вместо запуска своей копии.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, Tuple[asyncio.Task, Flight]] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        factory: Callable[[Flight], Awaitable[Any]],
+        on_queued: Optional[QueuedCallback] = None,
+        on_started: Optional[StartedCallback] = None,
+    ) -> Any:
+        """factory получает Flight и передаёт его on_queued/on_started в очередь парсинга."""
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            flight = Flight()
+            flight.join(on_queued, on_started)
+            # Отдельная задача, чтобы отмена одного ожидающего не отменяла остальных
+            task = asyncio.create_task(factory(flight))
+            self._inflight[key] = (task, flight)
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.started += 1
+        else:
+            task, flight = inflight
+            flight.join(on_queued, on_started)
+            self.coalesced += 1
+            # Присоединившийся к ждущему в очереди запросу сразу узнаёт своё место
+            if on_queued and flight.queued_at and not flight.started:
+                try:
+                    await on_queued(*flight.queued_at)
+                except Exception:
+                    logger.exception("Ошибка уведомления ожидающего запроса")
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight.leave(on_queued, on_started)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+scrape_flights = SingleFlight()
@@ -0,0 +1,53 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Iterator
+
+from config import PARSER_SNAPSHOT_DIR
+
+
+class SnapshotArchive:
+    """
+    Архив сырых карточек 2ГИС (HTML + JSON каталога), сжатых gzip и
+    адресуемых по sha256 содержимого: одинаковые карточки хранятся один раз.
+    """
+
+    def __init__(self, root: str = PARSER_SNAPSHOT_DIR):
+        self.root = root
+
+    def path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], f"{sha}.json.gz")
+
+    def save(self, snapshot: dict) -> str:
+        raw = json.dumps(snapshot, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        path = self.path(sha)
+        if os.path.exists(path):
+            return sha
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы не оставить обрезанный архив
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wb") as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        return sha
+
+    def load(self, sha: str) -> dict:
+        with gzip.open(self.path(sha), "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    def shas(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(".json.gz"):
+                    yield name[:-len(".json.gz")]
+
+
+snapshot_archive = SnapshotArchive()
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from db.db import async_session
+from db.models import CrawlJob, Zone, msk_now
+from db.crud.crawl_jobs import create_crawl_job, get_crawl_job, get_unfinished_crawl_jobs, update_crawl_job
+from db.crud.houses import get_house_by_address
+from db.crud.parsed_houses import save_parsed_house_to_db, extract_house_meta
+from utils.address import detect_city_and_zone_by_address
+from utils.messages import build_crawl_progress_message
+from utils.parser import search_houses_page, parse_house_by_url
+from utils.rate_limit import DGisUnavailable, DGisSelectorMiss
+from utils.scrape_queue import ScrapeQueueFull
+from config import CRAWL_QUERY_TEMPLATE, CRAWL_MAX_PAGES, CRAWL_HOUSE_DELAY
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CRAWL_NOTES = "Добавлено обходом 2ГИС"
+
+# Сколько раз подряд повторять страницу, которую 2ГИС не показал
+CRAWL_MISS_ATTEMPTS = 3
+
+
+def house_title(info: dict) -> str:
+    """«Улица Тимирязева, 4» из карточки -> «Тимирязева 4», как ждёт extract_house_meta."""
+    title = info.get("title", "")
+    if "," in title:
+        street, number = title.rsplit(",", 1)
+        return f"{street.replace('Улица', '').strip()} {number.strip()}"
+    return title
+
+
+class ZoneCrawler:
+    """
+    Фоновый обход всех домов района по выдаче 2ГИС с сохранением в houses.
+
+    Прогресс хранится в crawl_jobs постранично, поэтому после перезапуска бота
+    обход продолжается со следующей необработанной страницы.
+    """
+
+    def __init__(
+        self,
+        query_template: str = CRAWL_QUERY_TEMPLATE,
+        max_pages: int = CRAWL_MAX_PAGES,
+        house_delay: float = CRAWL_HOUSE_DELAY,
+    ):
+        self.query_template = query_template
+        self.max_pages = max_pages
+        self.house_delay = house_delay
+
+        self.bot: Optional[Bot] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def start(self, bot: Bot) -> None:
+        self.bot = bot
+        async with async_session() as session:
+            jobs = await get_unfinished_crawl_jobs(session)
+        for job in jobs:
+            logger.info("Продолжаем обход района %s (задача %s) со страницы %s", job.zone_id, job.id, job.last_page + 1)
+            self._spawn(job.id)
+
+    async def stop(self) -> None:
+        # Статус running остаётся в БД — при следующем запуске обход продолжится
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, zone: Zone, created_by: int, status_chat_id: int, status_message_id: int) -> int:
+        async with async_session() as session:
+            job = await create_crawl_job(
+                session,
+                zone_id=zone.id,
+                query=self.query_template.format(zone=zone.name),
+                created_by=created_by,
+                status_chat_id=status_chat_id,
+                status_message_id=status_message_id,
+            )
+        self._spawn(job.id)
+        return job.id
+
+    def _spawn(self, job_id: int) -> None:
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _report(self, job: CrawlJob, text: str) -> None:
+        if not self.bot or not job.status_chat_id or not job.status_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=job.status_chat_id, message_id=job.status_message_id)
+        except TelegramBadRequest as e:
+            logger.debug("Не удалось обновить прогресс обхода: %s", e)
+
+    async def _call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Ждёт, пока 2ГИС или очередь снова примут запрос, вместо того чтобы терять дом.
+        Незагрузившуюся страницу повторяет; если 2ГИС так её и не показал, ошибка
+        пробрасывается, а обход останавливается на последней целой странице.
+        """
+        misses = 0
+        while True:
+            try:
+                return await factory()
+            except DGisUnavailable as e:
+                await asyncio.sleep(max(e.retry_after, self.house_delay))
+            except ScrapeQueueFull:
+                await asyncio.sleep(self.house_delay)
+            except DGisSelectorMiss:
+                misses += 1
+                if misses >= CRAWL_MISS_ATTEMPTS:
+                    raise
+                await asyncio.sleep(self.house_delay * misses)
+
+    async def _run(self, job_id: int) -> None:
+        async with async_session() as session:
+            job = await get_crawl_job(session, job_id)
+        if job is None:
+            return
+        try:
+            await self._crawl(job)
+        except asyncio.CancelledError:
+            raise
+        except DGisSelectorMiss as e:
+            # Сбой 2ГИС, а не конец выдачи: задача остаётся незавершённой и продолжится после перезапуска
+            logger.warning("Обход района %s (задача %s) приостановлен: %s", job.zone_id, job.id, e)
+            async with async_session() as session:
+                await update_crawl_job(session, job.id, status="pending", last_error=str(e)[:1000])
+            await self._report(
+                job,
+                f"⏸ Обход района <b>{job.zone.name}</b> приостановлен: 2ГИС не показал страницу выдачи. "
+                f"Он продолжится со страницы {job.last_page + 1} после перезапуска бота."
+            )
+        except Exception as e:
+            logger.exception("Обход района %s (задача %s) прерван ошибкой", job.zone_id, job.id)
+            async with async_session() as session:
+                await update_crawl_job(session, job.id, status="failed", last_error=str(e)[:1000], finished_at=msk_now())
+            await self._report(job, f"❌ Обход района <b>{job.zone.name}</b> прерван ошибкой. Подробности в логе.")
+
+    async def _crawl(self, job: CrawlJob) -> None:
+        zone = job.zone
+        async with async_session() as session:
+            await update_crawl_job(session, job.id, status="running")
+
+        seen: Set[str] = set()
+        page_no = job.last_page
+        # Отдельный «пользователь» очереди: обход идёт по кругу наравне с живыми запросами
+        queue_user = -job.id
+
+        while page_no < self.max_pages:
+            page_no += 1
+            results = await self._call(
+                lambda: search_houses_page(zone.city.url, job.query, page_no, user_id=queue_user)
+            )
+            # Пустая страница приходит, только если 2ГИС подтвердил конец выдачи
+            urls = [r["url"] for r in results if r["url"] not in seen]
+            if not urls:
+                break
+
+            for url in urls:
+                seen.add(url)
+                job.found += 1
+                await asyncio.sleep(self.house_delay)
+                try:
+                    info = await self._call(lambda: parse_house_by_url(url, user_id=queue_user))
+                    if await self._save(job, zone, info):
+                        job.saved += 1
+                    else:
+                        job.skipped += 1
+                except Exception:
+                    logger.warning("Не удалось обработать дом %s при обходе района %s", url, zone.name, exc_info=True)
+                    job.failed += 1
+
+            # Контрольная точка: страница обработана целиком
+            job.last_page = page_no
+            async with async_session() as session:
+                await update_crawl_job(
+                    session, job.id,
+                    last_page=page_no, found=job.found, saved=job.saved,
+                    skipped=job.skipped, failed=job.failed
+                )
+            await self._report(job, build_crawl_progress_message(zone.name, job, page_no))
+
+        async with async_session() as session:
+            await update_crawl_job(session, job.id, status="done", finished_at=msk_now())
+        await self._report(job, build_crawl_progress_message(zone.name, job, job.last_page, finished=True))
+        logger.info(
+            "Обход района %s завершён: найдено %s, добавлено %s, пропущено %s, ошибок %s",
+            zone.name, job.found, job.saved, job.skipped, job.failed
+        )
+
+    async def _save(self, job: CrawlJob, zone: Zone, info: dict) -> bool:
+        """Сохраняет дом, если он из этого района и его ещё нет в базе."""
+        parsed = dict(info, title=house_title(info))
+        street, house_number, *_ = extract_house_meta(parsed)
+        if not street or not house_number:
+            return False
+
+        async with async_session() as session:
+            _, zone_obj = await detect_city_and_zone_by_address(session, info.get("address", ""))
+            if zone_obj is None or zone_obj.id != zone.id:
+                return False
+            if await get_house_by_address(session, zone.area_id, zone.id, street, house_number):
+                return False
+            await save_parsed_house_to_db(
+                session=session,
+                parsed_data=parsed,
+                area_id=zone.area_id,
+                zone_id=zone.id,
+                created_by=job.created_by,
+                notes=CRAWL_NOTES
+            )
+        return True
+
+    def stats(self) -> dict:
+        return {"active": len(self._tasks)}
+
+
+zone_crawler = ZoneCrawler()